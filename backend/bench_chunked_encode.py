@@ -0,0 +1,97 @@
+"""
+Benchmark: single-pass auto_reframe vs. parallel chunked encoding.
+
+Usage: python bench_chunked_encode.py <clip.mp4> [chunk_seconds] [workers]
+
+Renders the same clip both ways and compares wall time, frame count and
+duration of the outputs, then compares them frame by frame (PSNR): a
+repeated or dropped frame at a chunk boundary shows up as a run of
+mismatched frames.
+"""
+import sys
+import os
+import re
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import ffmpeg
+import core.processing as processing
+from core.processing import auto_reframe
+
+# Below this PSNR (dB) two frames are different pictures, not encoder noise
+FRAME_MATCH_MIN_PSNR = 30.0
+
+
+def probe_output(path: str) -> dict:
+    probe = ffmpeg.probe(path, count_frames=None, select_streams='v:0')
+    stream = probe['streams'][0]
+    return {
+        'frames': int(stream.get('nb_read_frames') or 0),
+        'duration': float(probe['format']['duration']),
+        'size_mb': os.path.getsize(path) / (1024 * 1024),
+    }
+
+
+def compare_frames(reference_path: str, path: str) -> list:
+    """Per-frame PSNR (dB) of path against reference_path."""
+    stats_path = path + ".psnr.log"
+    (
+        ffmpeg
+        .filter([ffmpeg.input(reference_path).video, ffmpeg.input(path).video], 'psnr', stats_file=stats_path)
+        .output('-', format='null')
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+    with open(stats_path, "r", encoding="utf-8") as f:
+        values = re.findall(r"psnr_avg:(\S+)", f.read())
+    os.remove(stats_path)
+    return [float('inf') if value == 'inf' else float(value) for value in values]
+
+
+def timed_reframe(clip_path: str, output_path: str, chunk_seconds=None) -> float:
+    started = time.perf_counter()
+    auto_reframe(clip_path, output_path, chunk_seconds=chunk_seconds)
+    return time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    clip_path = sys.argv[1]
+    chunk_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 20.0
+    if len(sys.argv) > 3:
+        processing.CHUNKED_ENCODE_WORKERS = int(sys.argv[3])
+
+    os.makedirs("output", exist_ok=True)
+    single_path = "output/bench_single.mp4"
+    chunked_path = "output/bench_chunked.mp4"
+
+    print("=" * 60)
+    print(f"Clip: {clip_path}")
+    print(f"Chunk size: {chunk_seconds}s, workers: {processing.CHUNKED_ENCODE_WORKERS}, CPUs: {os.cpu_count()}")
+    print("=" * 60)
+
+    single_time = timed_reframe(clip_path, single_path)
+    chunked_time = timed_reframe(clip_path, chunked_path, chunk_seconds=chunk_seconds)
+
+    single = probe_output(single_path)
+    chunked = probe_output(chunked_path)
+
+    print("\n" + "=" * 60)
+    print(f"{'':12}{'wall (s)':>10}{'frames':>10}{'duration':>10}{'size MB':>10}")
+    print(f"{'single':12}{single_time:>10.1f}{single['frames']:>10}{single['duration']:>10.2f}{single['size_mb']:>10.1f}")
+    print(f"{'chunked':12}{chunked_time:>10.1f}{chunked['frames']:>10}{chunked['duration']:>10.2f}{chunked['size_mb']:>10.1f}")
+    print(f"\nSpeedup: {single_time / chunked_time:.2f}x")
+    if single['frames'] == chunked['frames']:
+        print("✅ Frame counts match")
+    else:
+        print(f"⚠️  Frame count differs by {chunked['frames'] - single['frames']}")
+
+    psnr = compare_frames(single_path, chunked_path)
+    mismatched = [i for i, value in enumerate(psnr) if value < FRAME_MATCH_MIN_PSNR]
+    if mismatched:
+        print(f"⚠️  {len(mismatched)} frames differ from the single-pass render (first: frame {mismatched[0]})")
+    else:
+        print(f"✅ All {len(psnr)} frames match the single-pass render (min PSNR {min(psnr):.1f} dB)")
+    print("=" * 60)
@@ -0,0 +1,75 @@
+"""
+Benchmark: original vs. planned (optimized) reframe filter graphs.
+
+Usage: python bench_filter_plans.py [clip.mp4] [seconds]
+
+Always prints both filter chains and their estimated pixel operations per
+frame for every color grading preset (plus the baked 3D LUT variant), for a 1920x1080 source. With a clip,
+also renders its first `seconds` (default 10) with each plan and compares
+wall time.
+"""
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import ffmpeg
+from core.processing import auto_reframe, plan_reframe_graph
+
+PRESETS = ['none', 'cinematic_warm', 'cool_modern', 'vibrant', 'matte_film', 'bw_contrast']
+
+# auto_reframe's geometry for a centered crop of a 1920x1080 source
+GEOMETRY_1080P = {
+    'landscape': True,
+    'scaled_width': 3413,
+    'scaled_height': 1920,
+    'target_width': 1080,
+    'target_height': 1920,
+    'x': 1166,
+    'y': 0,
+    'source_width': 1920,
+    'source_height': 1080,
+    'source_x': 656,
+}
+
+
+def timed_reframe(clip_path: str, output_path: str, seconds: float, preset: str, optimize: bool) -> float:
+    started = time.perf_counter()
+    auto_reframe(clip_path, output_path, color_grading=preset, start=0, end=seconds, optimize_filters=optimize)
+    return time.perf_counter() - started
+
+
+if __name__ == "__main__":
+    print("=" * 72)
+    print("Estimated cost per frame, 1920x1080 -> 1080x1920 (M pixel-ops)")
+    print("=" * 72)
+    for preset in PRESETS:
+        original = plan_reframe_graph(GEOMETRY_1080P, preset, optimize=False)
+        planned = plan_reframe_graph(GEOMETRY_1080P, preset, optimize=True)
+        # Cost of the lut3d backend doesn't depend on the .cube contents
+        lut = plan_reframe_graph({**GEOMETRY_1080P, 'lut_path': f"{preset}.cube"}, preset, optimize=True)
+        print(f"{preset}")
+        print(f"  original {original.cost / 1e6:6.1f}  {original.describe()}")
+        print(f"  planned  {planned.cost / 1e6:6.1f}  {planned.describe()}")
+        if preset != 'none':
+            print(f"  lut3d    {lut.cost / 1e6:6.1f}  {lut.describe()}")
+        print(f"  -> {original.cost / planned.cost:.1f}x fewer pixel operations")
+
+    if len(sys.argv) < 2:
+        sys.exit(0)
+
+    clip_path = sys.argv[1]
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 10.0
+    os.makedirs("output", exist_ok=True)
+
+    print("\n" + "=" * 72)
+    print(f"Render timing: {clip_path}, first {seconds:.0f}s")
+    print("=" * 72)
+    for preset in ('none', 'bw_contrast'):
+        times = {}
+        for optimize in (False, True):
+            output_path = f"output/bench_plan_{preset}_{'planned' if optimize else 'original'}.mp4"
+            times[optimize] = timed_reframe(clip_path, output_path, seconds, preset, optimize)
+            frames = ffmpeg.probe(output_path, count_frames=None, select_streams='v:0')['streams'][0].get('nb_read_frames')
+            print(f"  {preset:<14} {'planned' if optimize else 'original':<9} {times[optimize]:6.1f}s  ({frames} frames)")
+        print(f"  {preset:<14} speedup   {times[False] / times[True]:.2f}x")
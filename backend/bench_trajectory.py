@@ -0,0 +1,78 @@
+"""
+Micro-benchmark: per-frame {frame: x} dict trajectories vs. the array-backed
+Trajectory.
+
+Usage: python bench_trajectory.py [frames ...]   (default: 10000 54000 216000)
+
+Times the post-detection path for each trajectory length - build the
+trajectory from smoothed positions, clamp it to the crop bounds and take
+the 20% trimmed mean auto_reframe centers on - and measures peak memory.
+"""
+import sys
+import os
+import time
+import tracemalloc
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+from core.trajectory import Trajectory
+
+WIDTH = 1920
+TARGET_WIDTH = int(1080 * (9/16))
+
+
+def dict_path(smoothed: np.ndarray) -> int:
+    """The previous implementation: dict per frame, clamp loop, sorted list."""
+    trajectory = {i: int(smoothed[i]) for i in range(len(smoothed))}
+    for f in trajectory:
+        min_x = TARGET_WIDTH // 2
+        max_x = WIDTH - (TARGET_WIDTH // 2)
+        trajectory[f] = max(min_x, min(trajectory[f], max_x))
+
+    sorted_positions = sorted(list(trajectory.values()))
+    trim_count = int(len(sorted_positions) * 0.2)
+    if trim_count > 0 and len(sorted_positions) > trim_count * 2:
+        trimmed = sorted_positions[trim_count:-trim_count]
+    else:
+        trimmed = sorted_positions
+    return int(sum(trimmed) / len(trimmed))
+
+
+def array_path(smoothed: np.ndarray) -> int:
+    trajectory = Trajectory(smoothed)
+    trajectory.clamp(TARGET_WIDTH // 2, WIDTH - (TARGET_WIDTH // 2))
+    return int(trajectory.trimmed_mean(0.2))
+
+
+def measure(fn, smoothed: np.ndarray, repeats: int = 5) -> tuple:
+    tracemalloc.start()
+    result = fn(smoothed)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    for _ in range(repeats):
+        fn(smoothed)
+    elapsed = (time.perf_counter() - started) / repeats
+    return result, elapsed, peak
+
+
+if __name__ == "__main__":
+    lengths = [int(arg) for arg in sys.argv[1:]] or [10_000, 54_000, 216_000]
+    rng = np.random.default_rng(0)
+
+    print("=" * 60)
+    print(f"{'frames':>8} {'path':>6} {'time':>10} {'peak mem':>10} {'center':>7}")
+    print("=" * 60)
+    for frames in lengths:
+        # A talking head drifting around X=900 with detector noise
+        smoothed = 900 + np.cumsum(rng.normal(0, 2, frames)) + rng.normal(0, 15, frames)
+
+        dict_center, dict_time, dict_peak = measure(dict_path, smoothed)
+        array_center, array_time, array_peak = measure(array_path, smoothed)
+
+        print(f"{frames:>8} {'dict':>6} {dict_time * 1000:>8.2f}ms {dict_peak / 1024:>8.0f}KB {dict_center:>7}")
+        print(f"{frames:>8} {'array':>6} {array_time * 1000:>8.2f}ms {array_peak / 1024:>8.0f}KB {array_center:>7}")
+        print(f"{'':>8} speedup {dict_time / array_time:.0f}x, memory {dict_peak / max(array_peak, 1):.0f}x less"
+              + ("" if abs(dict_center - array_center) <= 1 else "  ⚠️  centers differ"))
+        print("-" * 60)
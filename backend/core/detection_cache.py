@@ -0,0 +1,250 @@
+"""
+On-disk cache of raw per-frame detection positions.
+
+One .npz file per (source content hash, detector version, detection mode)
+holds every position detected so far - source time, center X, face width,
+confidence, method - plus the source time intervals already analysed and
+the ROI statistics of each detection run. Re-runs and overlapping segments
+only detect the intervals not covered yet.
+
+Like the source cache, the directory is bounded by size: once it grows past
+DETECTION_CACHE_MAX_BYTES the least recently used entries are deleted.
+"""
+import os
+import hashlib
+import threading
+
+import numpy as np
+
+DETECTION_CACHE_DIR = os.environ.get("DETECTION_CACHE_DIR", os.path.join("temp", "detection_cache"))
+# Gaps shorter than this are left to trajectory interpolation instead of
+# starting a detection pass for a handful of frames
+DETECTION_CACHE_MIN_GAP = 1.0
+# Bytes hashed from each of the start, middle and end of a source
+SOURCE_HASH_SAMPLE_BYTES = 1 << 20
+DETECTION_CACHE_MAX_BYTES = int(os.environ.get("DETECTION_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))  # 2 GB
+
+METHODS = ('mediapipe_face', 'body')
+COLUMNS = ('time', 'center', 'width', 'confidence', 'method')
+# One row per detection run ('roi' mode): the interval it covered plus its counters
+ROI_STATS_COLUMNS = ('start', 'end', 'roi_searches', 'roi_misses', 'full_searches', 'shot_cuts', 'avg_roi_area')
+
+detection_cache_stats = {"hits": 0, "partial": 0, "misses": 0, "evictions": 0}
+_detection_cache_lock = threading.Lock()
+_source_hashes = {}
+
+
+def source_content_hash(path: str) -> str:
+    """
+    Content hash of a video file from its size plus 1 MB samples of the
+    start, middle and end - cheap even for multi-GB sources, and stable
+    across renames and re-downloads of the same file.
+    """
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+    if memo_key in _source_hashes:
+        return _source_hashes[memo_key]
+
+    digest = hashlib.blake2b(str(stat.st_size).encode(), digest_size=16)
+    with open(path, "rb") as f:
+        for offset in (0, stat.st_size // 2, max(0, stat.st_size - SOURCE_HASH_SAMPLE_BYTES)):
+            f.seek(offset)
+            digest.update(f.read(SOURCE_HASH_SAMPLE_BYTES))
+    _source_hashes[memo_key] = digest.hexdigest()
+    return _source_hashes[memo_key]
+
+
+def _cache_path(source_hash: str, version: str, mode: str) -> str:
+    safe_version = "".join(c if c.isalnum() or c in "-." else "-" for c in version)
+    return os.path.join(DETECTION_CACHE_DIR, f"{source_hash}_{safe_version}_{mode}.npz")
+
+
+def _empty_rows() -> dict:
+    return {
+        'time': np.empty(0, dtype=np.float64),
+        'center': np.empty(0, dtype=np.float32),
+        'width': np.empty(0, dtype=np.float32),
+        'confidence': np.empty(0, dtype=np.float32),
+        'method': np.empty(0, dtype=np.int8),
+    }
+
+
+def _empty_roi_stats() -> np.ndarray:
+    return np.empty((0, len(ROI_STATS_COLUMNS)), dtype=np.float64)
+
+
+def load_detections(source_hash: str, version: str, mode: str) -> tuple:
+    """
+    Returns (rows, intervals, roi_stats): column arrays, the covered
+    [start, end) intervals and the ROI_STATS_COLUMNS rows of the entry.
+    Reading an entry counts as a use for LRU eviction.
+    """
+    path = _cache_path(source_hash, version, mode)
+    if os.path.exists(path):
+        try:
+            with np.load(path) as data:
+                rows = {column: data[column] for column in COLUMNS}
+                intervals = [tuple(interval) for interval in data['intervals'].tolist()]
+                roi_stats = data['roi_stats'] if 'roi_stats' in data.files else _empty_roi_stats()
+            touch_entry(path)
+            return rows, intervals, roi_stats
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️  Detection cache entry unreadable ({e}), starting fresh")
+    return _empty_rows(), [], _empty_roi_stats()
+
+
+def merge_intervals(intervals: list) -> list:
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def uncovered_intervals(intervals: list, start: float, end: float,
+                        min_gap: float = DETECTION_CACHE_MIN_GAP) -> list:
+    """Parts of [start, end) not covered by intervals, ignoring gaps shorter than min_gap."""
+    gaps = []
+    cursor = start
+    for covered_start, covered_end in merge_intervals(intervals):
+        if covered_end <= cursor:
+            continue
+        if covered_start >= end:
+            break
+        if covered_start > cursor:
+            gaps.append((cursor, covered_start))
+        cursor = max(cursor, covered_end)
+    if cursor < end:
+        gaps.append((cursor, end))
+    # A too-short gap is still worth detecting when it is all there is
+    if len(gaps) == 1 and gaps[0] == (start, end):
+        return gaps
+    return [(a, b) for a, b in gaps if b - a >= min_gap]
+
+
+def store_detections(source_hash: str, version: str, mode: str, new_rows: dict, new_intervals: list,
+                     new_roi_stats: list = ()):
+    """
+    Adds freshly detected rows, the intervals they cover and the ROI stats
+    of the runs that produced them, as (start, end, roi_stats) tuples.
+    Re-reads the entry under the lock so concurrent clips of the same source
+    don't drop each other's results; written via a temp file + rename, then
+    the cache is trimmed to DETECTION_CACHE_MAX_BYTES.
+    """
+    os.makedirs(DETECTION_CACHE_DIR, exist_ok=True)
+    path = _cache_path(source_hash, version, mode)
+    with _detection_cache_lock:
+        rows, intervals, roi_stats = load_detections(source_hash, version, mode)
+        # Drop stale rows inside the re-detected intervals
+        keep = np.ones(len(rows['time']), dtype=bool)
+        for start, end in new_intervals:
+            keep &= ~((rows['time'] >= start) & (rows['time'] < end))
+        rows = {column: np.concatenate([rows[column][keep], new_rows[column]]) for column in COLUMNS}
+        order = np.argsort(rows['time'], kind='stable')
+        rows = {column: values[order] for column, values in rows.items()}
+        intervals = merge_intervals(intervals + list(new_intervals))
+
+        keep = np.ones(len(roi_stats), dtype=bool)
+        for start, end in new_intervals:
+            keep &= ~((roi_stats[:, 0] >= start) & (roi_stats[:, 1] <= end))
+        added = [[start, end, *(stats[key] for key in ROI_STATS_COLUMNS[2:])] for start, end, stats in new_roi_stats]
+        roi_stats = np.concatenate([roi_stats[keep], np.asarray(added, dtype=np.float64).reshape(-1, len(ROI_STATS_COLUMNS))])
+
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, intervals=np.asarray(intervals, dtype=np.float64).reshape(-1, 2),
+                 roi_stats=roi_stats, **rows)
+        os.replace(tmp_path, path)
+    evict_entries(keep=path)
+
+
+def roi_stats_in_window(roi_stats: np.ndarray, start: float, end: float) -> list:
+    """ROI stats dicts of the detection runs overlapping [start, end)."""
+    overlapping = roi_stats[(roi_stats[:, 0] < end) & (roi_stats[:, 1] > start)]
+    return [
+        {key: (float(value) if key == 'avg_roi_area' else int(value)) for key, value in zip(ROI_STATS_COLUMNS[2:], row[2:])}
+        for row in overlapping
+    ]
+
+
+def touch_entry(path: str):
+    """Marks a cache file as just used - its mtime is the LRU timestamp."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def evict_entries(keep: str = None, max_bytes: int = None):
+    """
+    Deletes least recently used cache files (detections and scene indexes)
+    until the directory is under max_bytes (DETECTION_CACHE_MAX_BYTES).
+    `keep` is never deleted.
+    """
+    max_bytes = DETECTION_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    with _detection_cache_lock:
+        try:
+            names = os.listdir(DETECTION_CACHE_DIR)
+        except OSError:
+            return
+        entries = []
+        for name in names:
+            path = os.path.join(DETECTION_CACHE_DIR, name)
+            if ".tmp" in name:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"⚠️  Could not evict {path}: {e}")
+                continue
+            total -= size
+            detection_cache_stats["evictions"] += 1
+            print(f"🗑️  Evicted detection cache entry: {os.path.basename(path)}")
+
+
+def rows_from_positions(positions: list, method: str, window_start: float, fps: float) -> dict:
+    """Converts detect_subjects positions (window-relative frames) to cache rows (source time)."""
+    if not positions:
+        return _empty_rows()
+    frames, centers, widths, confidences = (np.asarray(column) for column in zip(*positions))
+    return {
+        'time': window_start + frames.astype(np.float64) / fps,
+        'center': centers.astype(np.float32),
+        'width': widths.astype(np.float32),
+        'confidence': confidences.astype(np.float32),
+        'method': np.full(len(frames), METHODS.index(method), dtype=np.int8),
+    }
+
+
+def positions_in_window(rows: dict, start: float, end: float, fps: float) -> tuple:
+    """
+    Cached rows inside [start, end) as (positions, method) with frame numbers
+    relative to start. Faces win over bodies, as in a single detection pass.
+    Returns ([], None) when nothing was detected in the window.
+    """
+    in_window = (rows['time'] >= start) & (rows['time'] < end)
+    faces = in_window & (rows['method'] == METHODS.index('mediapipe_face'))
+    selected = faces if faces.any() else in_window
+    if not selected.any():
+        return [], None
+
+    method = METHODS[int(rows['method'][selected][0])]
+    frames = np.rint((rows['time'][selected] - start) * fps).astype(np.int64)
+    positions = list(zip(
+        frames.tolist(), rows['center'][selected].tolist(),
+        rows['width'][selected].tolist(), rows['confidence'][selected].tolist()
+    ))
+    return positions, method
@@ -1,26 +1,560 @@
 import yt_dlp
 import os
+import re
+import json
+import copy
+import math
+import hashlib
+import time
+import threading
+from typing import Optional
+from core.timecode import segment_bounds
 
-def download_youtube_video(url: str, output_dir: str = "temp", resolution: str = "1080p", cookies_file: str = None):
-    """
-    Downloads video from YouTube using yt-dlp with specified resolution.
-    
-    Args:
-        url: YouTube video URL
-        output_dir: Directory to save downloaded video
-        resolution: Target resolution ('1080p', '720p', '480p', '360p')
-        cookies_file: Path to cookies file (Netscape format) for authentication.
-                     If None, will try to use browser cookies automatically.
-    """
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+# SOURCE CACHE
+# Downloaded sources stay in output_dir and are reused by later jobs.
+# Entries are keyed by (video id, target height, format policy) and tracked in a JSON manifest
+# next to the files. Range downloads are cached the same way, one entry per
+# section file, and reused by later requests whose ranges they cover. When the cache grows past SOURCE_CACHE_MAX_BYTES the least
+# recently used sources are deleted (sources used by a running job are pinned).
+SOURCE_CACHE_MAX_BYTES = 20 * 1024 ** 3  # 20 GB
+SOURCE_CACHE_MANIFEST = "source_cache.json"
+
+source_cache_stats = {"hits": 0, "misses": 0, "evictions": 0, "coalesced": 0}
+_source_cache_lock = threading.RLock()
+_pinned_sources = {}  # path -> number of jobs currently using it
+
+# IN-FLIGHT DOWNLOADS
+# Concurrent jobs asking for the same video/format wait on a single download
+# instead of racing to write the same file in output_dir.
+_inflight_downloads = {}  # key -> _InflightDownload
+_inflight_lock = threading.Lock()
 
-    # Parse target height
+# METADATA CACHE
+# extract_info results and cookie-validity verdicts, keyed by
+# (URL, cookies file, cookies mtime). The TTL stays well below YouTube's
+# signed format URL lifetime (~6h) so cached formats are still downloadable.
+INFO_CACHE_TTL_SECONDS = 30 * 60
+
+info_cache_stats = {"hits": 0, "misses": 0}
+_info_cache = {}  # key -> (cached_at, info dict)
+_cookie_verdicts = {}  # key -> (cached_at, bool)
+_info_cache_lock = threading.Lock()
+
+# FORMAT SELECTION
+# AV1/VP9 are far more expensive to software-decode than H.264, and every
+# source gets decoded several times (detection passes + re-encodes).
+# Relative per-pixel decode cost, H.264 = 1.0:
+CODEC_DECODE_COST = {
+    'avc1': 1.0, 'h264': 1.0,
+    'vp8': 1.2,
+    'hev1': 1.6, 'hvc1': 1.6, 'hevc': 1.6,
+    'vp09': 1.8, 'vp9': 1.8,
+    'av01': 3.0,
+}
+
+FORMAT_POLICIES = {
+    # Highest resolution <= target, codec ignored (plain yt-dlp behaviour)
+    'quality': {'decode_weight': 0.0, 'prefer_codec': None},
+    # Trade resolution against estimated decode cost
+    'balanced': {'decode_weight': 1.0, 'prefer_codec': None},
+    # Like balanced, but take avc1 whenever it exists at the best height
+    'prefer_avc1': {'decode_weight': 1.0, 'prefer_codec': 'avc1'},
+}
+DEFAULT_FORMAT_POLICY = 'prefer_avc1'
+
+_source_meta = {}  # path -> format details of downloads made by this process
+
+# RANGE DOWNLOADS
+# Seconds fetched around each requested segment. Covers keyframe alignment of
+# the range cut so the exact cut in extract_highlight always has data.
+RANGE_PADDING_SECONDS = 2.0
+
+_YOUTUBE_ID_RE = re.compile(r'(?:[?&]v=|youtu\.be/|/shorts/|/embed/|/live/)([0-9A-Za-z_-]{11})')
+
+
+def parse_target_height(resolution: str) -> int:
+    """Converts a resolution label ('1080p', '720p', ...) to a pixel height."""
     target_height = 1080
     if resolution == "720p": target_height = 720
     elif resolution == "480p": target_height = 480
     elif resolution == "360p": target_height = 360
-    
+    return target_height
+
+
+def extract_video_id(url: str) -> Optional[str]:
+    """
+    Extracts the YouTube video id from a URL without touching the network.
+    Returns None for URLs we can't parse (other sites, direct file links).
+    """
+    match = _YOUTUBE_ID_RE.search(url)
+    return match.group(1) if match else None
+
+
+def _cache_key(video_id: str, target_height: int, format_policy: str) -> str:
+    # Policies pick different formats (codecs) for the same height
+    return f"{video_id}@{target_height}p.{format_policy}"
+
+
+def _range_cache_key(video_id: str, target_height: int, format_policy: str, start: float, end: float) -> str:
+    return f"{_cache_key(video_id, target_height, format_policy)}[{start:.1f}-{end:.1f}]"
+
+
+def _manifest_path(output_dir: str) -> str:
+    return os.path.join(output_dir, SOURCE_CACHE_MANIFEST)
+
+
+def _load_manifest(output_dir: str) -> dict:
+    path = _manifest_path(output_dir)
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            manifest.setdefault("entries", {})
+            manifest.setdefault("aliases", {})
+            return manifest
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Source cache manifest unreadable ({e}), starting fresh")
+    return {"entries": {}, "aliases": {}}
+
+
+def _save_manifest(output_dir: str, manifest: dict):
+    # Write to a temp file first so a crash never leaves a half-written manifest
+    path = _manifest_path(output_dir)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _pin_source(path: str):
+    _pinned_sources[path] = _pinned_sources.get(path, 0) + 1
+
+
+def release_cached_source(path: str):
+    """
+    Marks a source returned by download_youtube_video as no longer in use,
+    so it becomes eligible for LRU eviction again.
+    """
+    with _source_cache_lock:
+        count = _pinned_sources.get(path, 0) - 1
+        if count > 0:
+            _pinned_sources[path] = count
+        else:
+            _pinned_sources.pop(path, None)
+
+
+def lookup_cached_source(url: str, output_dir: str = "temp", resolution: str = "1080p",
+                         format_policy: str = DEFAULT_FORMAT_POLICY) -> Optional[str]:
+    """
+    Returns the path of a cached download for this URL/resolution/format
+    policy, or None.
+    A hit refreshes the entry's LRU timestamp and pins it for the caller
+    (call release_cached_source when done).
+    """
+    target_height = parse_target_height(resolution)
+    with _source_cache_lock:
+        manifest = _load_manifest(output_dir)
+        video_id = extract_video_id(url) or manifest["aliases"].get(url)
+        if not video_id:
+            return None
+
+        key = _cache_key(video_id, target_height, format_policy)
+        entry = manifest["entries"].get(key)
+        if not entry:
+            return None
+
+        path = entry["path"]
+        if not os.path.exists(path):
+            # File was removed behind our back - forget the entry
+            del manifest["entries"][key]
+            _save_manifest(output_dir, manifest)
+            return None
+
+        entry["last_access"] = time.time()
+        entry["hits"] = entry.get("hits", 0) + 1
+        _save_manifest(output_dir, manifest)
+        _pin_source(path)
+        source_cache_stats["hits"] += 1
+
+    print(f"♻️  Source cache hit: {os.path.basename(path)}")
+    return path
+
+
+def _register_cached_source(output_dir: str, url: str, target_height: int, format_policy: str, path: str, info: dict):
+    """Adds a fresh download to the manifest, pins it and evicts old entries."""
+    with _source_cache_lock:
+        manifest = _load_manifest(output_dir)
+        video_id = info["id"]
+        key = _cache_key(video_id, target_height, format_policy)
+        now = time.time()
+        manifest["entries"][key] = {
+            "path": path,
+            "video_id": video_id,
+            "target_height": target_height,
+            "format_policy": format_policy,
+            "height": info.get("height"),
+            **_format_meta(info),
+            "size": os.path.getsize(path),
+            "created": now,
+            "last_access": now,
+            "hits": 0,
+        }
+        if extract_video_id(url) != video_id:
+            manifest["aliases"][url] = video_id
+        _source_meta[path] = _format_meta(info)
+        _pin_source(path)
+        source_cache_stats["misses"] += 1
+        _evict_sources(manifest, keep=[key])
+        _save_manifest(output_dir, manifest)
+
+
+def lookup_cached_ranges(url: str, output_dir: str, target_height: int, format_policy: str, ranges: list) -> list:
+    """
+    Finds cached section files covering each (start, end) range.
+    Returns one (path, offset) per range, or None where nothing covers it.
+    Hits are pinned like lookup_cached_source hits - once per file, even if
+    it covers several ranges, since callers release each file once.
+    """
+    with _source_cache_lock:
+        manifest = _load_manifest(output_dir)
+        video_id = extract_video_id(url) or manifest["aliases"].get(url)
+        if not video_id:
+            return [None] * len(ranges)
+
+        sections = [
+            entry for entry in manifest["entries"].values()
+            if entry.get("range") and entry["video_id"] == video_id and entry["target_height"] == target_height
+            and entry.get("format_policy") == format_policy and os.path.exists(entry["path"])
+        ]
+        found = []
+        pinned = set()
+        now = time.time()
+        for start, end in ranges:
+            entry = next((e for e in sections if e["range"][0] <= start and end <= e["range"][1]), None)
+            if entry is None:
+                found.append(None)
+                continue
+            entry["last_access"] = now
+            entry["hits"] = entry.get("hits", 0) + 1
+            if entry["path"] not in pinned:
+                _pin_source(entry["path"])
+                pinned.add(entry["path"])
+            source_cache_stats["hits"] += 1
+            found.append((entry["path"], entry["range"][0]))
+        if any(found):
+            _save_manifest(output_dir, manifest)
+
+    for hit in filter(None, found):
+        print(f"♻️  Source cache hit: {os.path.basename(hit[0])}")
+    return found
+
+
+def _register_cached_ranges(output_dir: str, url: str, target_height: int, format_policy: str,
+                            ranges: list, paths: list, info: dict):
+    """Adds freshly downloaded section files to the manifest, pins them and evicts old entries."""
+    with _source_cache_lock:
+        manifest = _load_manifest(output_dir)
+        video_id = info["id"]
+        now = time.time()
+        keys = []
+        for (start, end), path in zip(ranges, paths):
+            key = _range_cache_key(video_id, target_height, format_policy, start, end)
+            manifest["entries"][key] = {
+                "path": path,
+                "video_id": video_id,
+                "target_height": target_height,
+                "format_policy": format_policy,
+                "range": [start, end],
+                **_format_meta(info),
+                "size": os.path.getsize(path),
+                "created": now,
+                "last_access": now,
+                "hits": 0,
+            }
+            keys.append(key)
+            _pin_source(path)
+            source_cache_stats["misses"] += 1
+        if extract_video_id(url) != video_id:
+            manifest["aliases"][url] = video_id
+        _evict_sources(manifest, keep=keys)
+        _save_manifest(output_dir, manifest)
+
+
+def _evict_sources(manifest: dict, keep=None):
+    """Deletes least recently used, unpinned sources until under the size limit."""
+    entries = manifest["entries"]
+    total = sum(e.get("size", 0) for e in entries.values())
+    if total <= SOURCE_CACHE_MAX_BYTES:
+        return
+
+    for key, entry in sorted(entries.items(), key=lambda kv: kv[1].get("last_access", 0)):
+        if total <= SOURCE_CACHE_MAX_BYTES:
+            break
+        if key in (keep or ()) or entry["path"] in _pinned_sources:
+            continue
+        try:
+            if os.path.exists(entry["path"]):
+                os.remove(entry["path"])
+        except OSError as e:
+            print(f"⚠️  Could not evict {entry['path']}: {e}")
+            continue
+        total -= entry.get("size", 0)
+        del entries[key]
+        source_cache_stats["evictions"] += 1
+        print(f"🗑️  Evicted cached source: {os.path.basename(entry['path'])}")
+
+
+def get_source_cache_stats(output_dir: str = "temp") -> dict:
+    """Hit/miss/eviction counters plus current cache size."""
+    with _source_cache_lock:
+        manifest = _load_manifest(output_dir)
+        return {
+            **source_cache_stats,
+            "info_cache": dict(info_cache_stats),
+            "entries": len(manifest["entries"]),
+            "size_bytes": sum(e.get("size", 0) for e in manifest["entries"].values()),
+            "max_bytes": SOURCE_CACHE_MAX_BYTES,
+        }
+
+
+class _InflightDownload:
+    """One running download that other requests can wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+def _single_flight(key: tuple, download_fn) -> tuple:
+    """
+    Runs download_fn once per key, no matter how many threads ask at once.
+    The first caller (leader) downloads; everyone else blocks until it
+    finishes and gets the same result (or the same exception).
+    Returns (result, is_leader).
+    """
+    with _inflight_lock:
+        flight = _inflight_downloads.get(key)
+        is_leader = flight is None
+        if is_leader:
+            flight = _InflightDownload()
+            _inflight_downloads[key] = flight
+        else:
+            flight.waiters += 1
+            source_cache_stats["coalesced"] += 1
+
+    if not is_leader:
+        print(f"⏳ Same download already in progress, waiting for it: {key[1]}")
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result, False
+
+    try:
+        flight.result = download_fn()
+        return flight.result, True
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight_downloads[key]
+        if flight.waiters:
+            print(f"🔗 Shared download with {flight.waiters} waiting request(s): {key[1]}")
+        flight.done.set()
+
+
+def _info_cache_key(url: str, cookies_to_use: Optional[str]) -> tuple:
+    # Replacing the cookies file changes its mtime, which invalidates old entries
+    cookie_mtime = None
+    if cookies_to_use and os.path.exists(cookies_to_use):
+        cookie_mtime = os.path.getmtime(cookies_to_use)
+    return (url, cookies_to_use, cookie_mtime)
+
+
+def _get_cached(cache: dict, key: tuple):
+    with _info_cache_lock:
+        entry = cache.get(key)
+        if entry is None:
+            return None
+        cached_at, value = entry
+        if time.time() - cached_at > INFO_CACHE_TTL_SECONDS:
+            del cache[key]
+            return None
+        return value
+
+
+def _get_cookie_verdict(url: str, cookies_to_use: str) -> Optional[bool]:
+    """True/False if these cookies were already checked for this URL, else None."""
+    return _get_cached(_cookie_verdicts, _info_cache_key(url, cookies_to_use))
+
+
+def _set_cookie_verdict(url: str, cookies_to_use: str, valid: bool):
+    with _info_cache_lock:
+        _cookie_verdicts[_info_cache_key(url, cookies_to_use)] = (time.time(), valid)
+
+
+def extract_video_info(url: str, ydl_opts: dict, cookies_to_use: Optional[str] = None) -> dict:
+    """
+    extract_info(download=False) with a TTL cache per (URL, cookies file mtime).
+    Returns a private copy the caller may modify.
+    """
+    key = _info_cache_key(url, cookies_to_use)
+    info = _get_cached(_info_cache, key)
+    if info is not None:
+        info_cache_stats["hits"] += 1
+        print(f"♻️  Using cached video info: {info.get('id')}")
+        return copy.deepcopy(info)
+
+    info_cache_stats["misses"] += 1
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.sanitize_info(ydl.extract_info(url, download=False))
+
+    with _info_cache_lock:
+        _info_cache[key] = (time.time(), info)
+    return copy.deepcopy(info)
+
+
+def invalidate_video_info(url: str, cookies_to_use: Optional[str] = None):
+    """Drops the cached info (e.g. after its format URLs stopped working)."""
+    with _info_cache_lock:
+        _info_cache.pop(_info_cache_key(url, cookies_to_use), None)
+
+
+def _download_from_info(url: str, ydl_opts: dict, cookies_to_use: Optional[str], info: dict) -> dict:
+    """
+    Downloads from an already-extracted info dict (format selection is redone
+    with ydl_opts, so one cached info serves every resolution/range request).
+    """
+    try:
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            return ydl.process_ie_result(info, download=True)
+    except Exception:
+        # Stale format URLs are the usual culprit - don't serve them again
+        invalidate_video_info(url, cookies_to_use)
+        raise
+
+
+def estimate_decode_cost(fmt: dict) -> float:
+    """
+    Relative cost of software-decoding a format, normalized so that
+    1080p30 H.264 at ~5 Mbps is 1.0. Scales with pixel rate, codec
+    complexity and (mildly) bitrate, since entropy decoding grows with it.
+    """
+    vcodec = (fmt.get('vcodec') or '').split('.')[0].lower()
+    codec_factor = CODEC_DECODE_COST.get(vcodec, 1.5)
+    width = fmt.get('width') or (fmt.get('height') or 1080) * 16 / 9
+    height = fmt.get('height') or 1080
+    fps = fmt.get('fps') or 30
+    pixel_rate = (width * height * fps) / (1920 * 1080 * 30)
+    bitrate_mbps = (fmt.get('vbr') or fmt.get('tbr') or 5000) / 1000
+    return codec_factor * pixel_rate * (1 + 0.05 * (bitrate_mbps - 5))
+
+
+def rank_video_formats(formats: list, target_height: int, format_policy: str = DEFAULT_FORMAT_POLICY) -> list:
+    """
+    Orders video formats best-first under the given policy.
+    Score = resolution utility (height / target, capped at target)
+            - decode_weight * 0.1 * log2(decode cost)
+    With prefer_codec set, formats in that codec win whenever one exists
+    at the best available height <= target.
+    """
+    policy = FORMAT_POLICIES.get(format_policy, FORMAT_POLICIES[DEFAULT_FORMAT_POLICY])
+    videos = [f for f in formats if f.get('vcodec') not in (None, 'none') and f.get('height')]
+    if not videos:
+        return []
+
+    # Never go above the requested height unless nothing fits
+    fitting = [f for f in videos if f['height'] <= target_height]
+    candidates = fitting or [min(videos, key=lambda f: f['height'])]
+
+    def score(f):
+        utility = min(f['height'], target_height) / target_height
+        penalty = policy['decode_weight'] * 0.1 * math.log2(max(estimate_decode_cost(f), 1e-3))
+        return (utility - penalty, f.get('tbr') or 0)
+
+    ranked = sorted(candidates, key=score, reverse=True)
+
+    prefer_codec = policy.get('prefer_codec')
+    if prefer_codec:
+        best_height = max(f['height'] for f in candidates)
+        preferred = [f for f in ranked if f['height'] == best_height and (f.get('vcodec') or '').startswith(prefer_codec)]
+        if preferred:
+            ranked = preferred + [f for f in ranked if f not in preferred]
+
+    return ranked
+
+
+def select_format(info: dict, target_height: int, format_policy: str = DEFAULT_FORMAT_POLICY) -> str:
+    """
+    Builds the yt-dlp format string for the top-ranked video format,
+    keeping the generic height-limited selection as a fallback.
+    """
+    fallback = f'bestvideo[height<={target_height}]+bestaudio/bestvideo+bestaudio/best'
+    ranked = rank_video_formats(info.get('formats') or [], target_height, format_policy)
+    if not ranked:
+        print(f"📥 Downloading with format: {fallback}")
+        return fallback
+
+    best = ranked[0]
+    if best.get('acodec') not in (None, 'none'):
+        format_str = f"{best['format_id']}/{fallback}"
+    else:
+        # m4a (AAC) audio merges into MP4 without re-encoding
+        format_str = f"{best['format_id']}+bestaudio[ext=m4a]/{best['format_id']}+bestaudio/{fallback}"
+
+    print(f"📥 Downloading with format: {format_str}")
+    print(f"   Chosen video: {best.get('vcodec')} {best.get('width')}x{best['height']}@{best.get('fps')} "
+          f"(policy={format_policy}, est. decode cost {estimate_decode_cost(best):.2f})")
+    return format_str
+
+
+def _format_meta(info: dict) -> dict:
+    """Codec/format details of a finished download, for status reporting."""
+    return {
+        "format_id": info.get("format_id"),
+        "vcodec": info.get("vcodec"),
+        "acodec": info.get("acodec"),
+        "height": info.get("height"),
+        "fps": info.get("fps"),
+    }
+
+
+def describe_source(path: str, output_dir: str = "temp") -> dict:
+    """Returns format/codec details recorded for a downloaded source file."""
+    meta = _source_meta.get(path)
+    if meta:
+        return dict(meta)
+    with _source_cache_lock:
+        manifest = _load_manifest(output_dir)
+    for entry in manifest["entries"].values():
+        if entry["path"] == path:
+            return {key: entry.get(key) for key in ("format_id", "vcodec", "acodec", "height", "fps")}
+    return {}
+
+
+def _resolve_cookies(cookies_file: str = None) -> Optional[str]:
+    """
+    Picks the cookies file to use.
+    Priority:
+    1. Explicit cookies_file (if provided and exists)
+    2. Auto-detected youtube_cookies.txt in the backend folder
+    """
+    if cookies_file and os.path.exists(cookies_file):
+        return cookies_file
+
+    # Auto-detect youtube_cookies.txt in backend folder
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    backend_dir = os.path.dirname(script_dir)
+    auto_cookies_path = os.path.join(backend_dir, 'youtube_cookies.txt')
+
+    if os.path.exists(auto_cookies_path):
+        return auto_cookies_path
+    return None
+
+
+def _build_ydl_opts(output_dir: str, target_height: int, format_policy: str = DEFAULT_FORMAT_POLICY) -> dict:
     # SIMPLIFIED & ROBUST Format Selection
     # Strategy: Try to respect resolution preference, but ALWAYS fallback to 'best'
     # This guarantees the download will never fail due to format unavailability
@@ -32,13 +566,14 @@ def download_youtube_video(url: str, output_dir: str = "temp", resolution: str =
     # Note: Some videos don't have separate video/audio streams at specific heights,
     # so we must have a simple 'best' fallback
     
+    # This generic string is only used while extracting info; the download
+    # itself uses the format chosen by select_format()
     format_str = f'bestvideo[height<={target_height}]+bestaudio/bestvideo+bestaudio/best'
     
-    print(f"📥 Downloading with format: {format_str}")
-    
-    ydl_opts = {
+    return {
         'format': format_str,
-        'outtmpl': os.path.join(output_dir, '%(id)s.%(ext)s'),
+        # Height/policy suffix keeps different downloads of one video from overwriting each other
+        'outtmpl': os.path.join(output_dir, f'%(id)s_{target_height}p_{format_policy}.%(ext)s'),
         'noplaylist': True,
         'merge_output_format': 'mp4', # Force output to be MP4
         # User agent for better compatibility
@@ -48,26 +583,15 @@ def download_youtube_video(url: str, output_dir: str = "temp", resolution: str =
         # REMOVED player_client args - they can cause format issues
         # Let yt-dlp use its default client selection (more reliable)
     }
-    
-    # Add cookies support with smart detection and validation
-    # Priority:
-    # 1. Try with explicit cookies_file (if provided and valid)
-    # 2. Try with auto-detected youtube_cookies.txt (if valid)
-    # 3. Download without cookies
-    
-    cookies_to_use = None
-    
-    if cookies_file and os.path.exists(cookies_file):
-        cookies_to_use = cookies_file
-    else:
-        # Auto-detect youtube_cookies.txt in backend folder
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        backend_dir = os.path.dirname(script_dir)
-        auto_cookies_path = os.path.join(backend_dir, 'youtube_cookies.txt')
-        
-        if os.path.exists(auto_cookies_path):
-            cookies_to_use = auto_cookies_path
-    
+
+
+def _download_with_cookie_fallback(url: str, ydl_opts: dict, cookies_to_use: Optional[str],
+                                   target_height: int, format_policy: str = DEFAULT_FORMAT_POLICY) -> dict:
+    """
+    Runs the yt-dlp download and returns its info dict.
+    Tries with cookies first (validating them), then without.
+    The concrete format is picked from the extracted info by format_policy.
+    """
     # Try with cookies first (if available)
     if cookies_to_use:
         try:
@@ -75,16 +599,20 @@ def download_youtube_video(url: str, output_dir: str = "temp", resolution: str =
             ydl_opts_with_cookies = ydl_opts.copy()
             ydl_opts_with_cookies['cookiefile'] = cookies_to_use
             
-            # OPTIMIZATION: Do a quick format check without full extraction
-            # This validates cookies without downloading twice
+            verdict = _get_cookie_verdict(url, cookies_to_use)
+            if verdict is False:
+                raise Exception("Cookies already known to be corrupt/expired - retry without")
+
+            # OPTIMIZATION: Validate cookies with the (cached) metadata extraction
+            # and reuse that same info for the download - no second extract_info
             print(f"🔍 Validating cookies...")
-            with yt_dlp.YoutubeDL(ydl_opts_with_cookies) as ydl:
-                # Quick check: extract_info with download=False is fast
-                info_check = ydl.extract_info(url, download=False)
-                
+            info_check = extract_video_info(url, ydl_opts_with_cookies, cookies_to_use)
+            
+            if verdict is None:
                 # Validate that we got actual video formats, not just images
                 formats = info_check.get('formats', [])
                 has_video = any(f.get('vcodec') != 'none' and f.get('vcodec') != None for f in formats)
+                _set_cookie_verdict(url, cookies_to_use, has_video)
                 
                 if not has_video:
                     print("⚠️  WARNING: Cookies returned no video formats (only images)!")
@@ -92,17 +620,10 @@ def download_youtube_video(url: str, output_dir: str = "temp", resolution: str =
                     print("   Retrying WITHOUT cookies...")
                     raise Exception("Corrupt/expired cookies - retry without")
                 
-                # Cookies are good, proceed with download using validated session
-                print(f"✅ Cookies valid! Downloading...")
-                
-            # Download with the validated cookies (reuse session info)
-            with yt_dlp.YoutubeDL(ydl_opts_with_cookies) as ydl:
-                info = ydl.extract_info(url, download=True)
-                video_id = info['id']
-                ext = info['ext']
-                final_path = os.path.join(output_dir, f"{video_id}.{ext}")
-                print(f"✅ Download complete: {os.path.basename(final_path)}")
-                return final_path
+            # Cookies are good, proceed with download using validated session
+            print(f"✅ Cookies valid! Downloading...")
+            ydl_opts_with_cookies['format'] = select_format(info_check, target_height, format_policy)
+            return _download_from_info(url, ydl_opts_with_cookies, cookies_to_use, info_check)
                 
         except Exception as e:
             error_msg = str(e)
@@ -115,13 +636,9 @@ def download_youtube_video(url: str, output_dir: str = "temp", resolution: str =
     # Try WITHOUT cookies (fallback or primary method)
     try:
         print(f"🎬 Extracting video info (without cookies)...")
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=True)
-            video_id = info['id']
-            ext = info['ext']
-            final_path = os.path.join(output_dir, f"{video_id}.{ext}")
-            print(f"✅ Download complete: {os.path.basename(final_path)}")
-            return final_path
+        info = extract_video_info(url, ydl_opts)
+        ydl_opts = {**ydl_opts, 'format': select_format(info, target_height, format_policy)}
+        return _download_from_info(url, ydl_opts, None, info)
     except Exception as e:
         error_msg = str(e)
         print(f"❌ Download Error: {error_msg}")
@@ -142,4 +659,310 @@ def download_youtube_video(url: str, output_dir: str = "temp", resolution: str =
         raise
 
 
+def plan_download_ranges(segments: list, padding: float = RANGE_PADDING_SECONDS) -> tuple:
+    """
+    Pads each segment and merges overlapping ranges so shared footage is
+    fetched once.
+    Returns (ranges, segment_to_range) where ranges is a sorted list of
+    (start, end) seconds and segment_to_range[i] is the index of the range
+    covering segment i.
+    """
+    bounds = [segment_bounds(segment) for segment in segments]
+    order = sorted(range(len(bounds)), key=lambda i: bounds[i][0])
+
+    ranges = []
+    segment_to_range = [0] * len(bounds)
+    for i in order:
+        start, end = bounds[i]
+        start = max(0.0, start - padding)
+        end = end + padding
+        if ranges and start <= ranges[-1][1]:
+            ranges[-1] = (ranges[-1][0], max(ranges[-1][1], end))
+        else:
+            ranges.append((start, end))
+        segment_to_range[i] = len(ranges) - 1
+
+    return ranges, segment_to_range
+
+
+class DownloadProgress:
+    """
+    Progress signal for a running download.
+
+    Tracks byte progress (for status messages) and which time ranges of the
+    source are already complete on disk, so consumers can block until the
+    data covering timestamp T is available and start working on it while
+    the rest is still downloading.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._available = []  # (start, end, path, offset) in source seconds
+        self.downloaded_bytes = 0
+        self.total_bytes = None
+        self.finished = False
+        self.error = None
+
+    @property
+    def percent(self) -> float:
+        if not self.total_bytes:
+            return 0.0
+        return min(100.0, self.downloaded_bytes / self.total_bytes * 100)
+
+    def update_bytes(self, downloaded: int, total: Optional[int]):
+        with self._cond:
+            self.downloaded_bytes = downloaded
+            self.total_bytes = total or self.total_bytes
+
+    def mark_available(self, start: float, end: float, path: str, offset: float = 0.0):
+        """Source time range [start, end] is readable from path (path time = source time - offset)."""
+        with self._cond:
+            self._available.append((start, end, path, offset))
+            self._cond.notify_all()
+
+    def finish(self):
+        with self._cond:
+            self.finished = True
+            self._cond.notify_all()
+
+    def fail(self, error: BaseException):
+        with self._cond:
+            self.error = error
+            self.finished = True
+            self._cond.notify_all()
+
+    def _find(self, start: float, end: float):
+        for range_start, range_end, path, offset in self._available:
+            if range_start <= start and end <= range_end:
+                return path, offset
+        return None
+
+    def wait_for_range(self, start: float, end: float, timeout: float = None):
+        """
+        Blocks until [start, end] (source seconds) is on disk.
+        Returns (path, offset), or None if timeout expires first.
+        Raises if the download failed or finished without covering the range.
+        """
+        with self._cond:
+            deadline = None if timeout is None else time.time() + timeout
+            while True:
+                found = self._find(start, end)
+                if found:
+                    return found
+                if self.error is not None:
+                    raise self.error
+                if self.finished:
+                    raise RuntimeError(f"Download finished without covering {start:.1f}-{end:.1f}s")
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+
+    def wait_until(self, timestamp: float, timeout: float = None):
+        """Blocks until source data up to `timestamp` is available; see wait_for_range."""
+        return self.wait_for_range(timestamp, timestamp, timeout)
+
+
+def _progress_opts(progress: Optional[DownloadProgress]) -> dict:
+    """yt-dlp hooks that feed a DownloadProgress."""
+    if progress is None:
+        return {}
+
+    def on_progress(d):
+        if d.get('status') in ('downloading', 'finished'):
+            progress.update_bytes(d.get('downloaded_bytes') or 0, d.get('total_bytes') or d.get('total_bytes_estimate'))
+
+    def on_postprocess(d):
+        # A section is final once MoveFiles has put it in place
+        info = d.get('info_dict') or {}
+        if d.get('status') == 'finished' and d.get('postprocessor') == 'MoveFiles' and 'section_start' in info:
+            start = float(info.get('section_start') or 0)
+            end = info.get('section_end')
+            end = float(end) if end is not None else float('inf')
+            progress.mark_available(start, end, info['filepath'], start)
+
+    return {'progress_hooks': [on_progress], 'postprocessor_hooks': [on_postprocess]}
+
+
+def _download_sections(url: str, output_dir: str, target_height: int, cookies_to_use: Optional[str], ranges: list,
+                       format_policy: str = DEFAULT_FORMAT_POLICY, progress: DownloadProgress = None) -> list:
+    """
+    Downloads only the given (start, end) ranges with yt-dlp's download_ranges.
+    Returns one file path per range.
+    """
+    # Tagged with the range set, so concurrent flights that share a range
+    # never write the same section file
+    flight_tag = hashlib.sha1(repr((format_policy, ranges)).encode()).hexdigest()[:8]
+    ydl_opts = _build_ydl_opts(output_dir, target_height, format_policy)
+    ydl_opts.update({
+        'download_ranges': yt_dlp.utils.download_range_func(None, ranges),
+        # Cuts land on the keyframe before each range start; the padding
+        # absorbs that and extract_highlight does the exact cut later
+        'force_keyframes_at_cuts': False,
+        'outtmpl': os.path.join(output_dir, f'%(id)s_{target_height}p_{flight_tag}_%(section_start)d-%(section_end)d.%(ext)s'),
+        **_progress_opts(progress),
+    })
+
+    print(f"✂️  Downloading {len(ranges)} range(s): " + ", ".join(f"{s:.1f}-{e:.1f}s" for s, e in ranges))
+    info = _download_with_cookie_fallback(url, ydl_opts, cookies_to_use, target_height, format_policy)
+
+    downloads = info.get('requested_downloads') or []
+    paths = []
+    for start, end in ranges:
+        match = next(
+            (d for d in downloads if d.get('filepath') and abs(float(d.get('section_start') or 0) - start) < 0.5),
+            None
+        )
+        if not match or not os.path.exists(match['filepath']):
+            raise RuntimeError(f"Range {start:.1f}-{end:.1f}s was not downloaded")
+        paths.append(match['filepath'])
+        _source_meta[match['filepath']] = _format_meta(info)
+    _register_cached_ranges(output_dir, url, target_height, format_policy, ranges, paths, info)
+    return paths
+
+
+def download_youtube_video(url: str, output_dir: str = "temp", resolution: str = "1080p", cookies_file: str = None,
+                           segments: list = None, padding: float = RANGE_PADDING_SECONDS,
+                           format_policy: str = DEFAULT_FORMAT_POLICY, progress: DownloadProgress = None):
+    """
+    Downloads video from YouTube using yt-dlp with specified resolution.
+    Repeated requests for the same video/resolution are served from the
+    source cache without touching the network.
+    
+    Args:
+        url: YouTube video URL
+        output_dir: Directory to save downloaded video
+        resolution: Target resolution ('1080p', '720p', '480p', '360p')
+        cookies_file: Path to cookies file (Netscape format) for authentication.
+                     If None, will try to use browser cookies automatically.
+        segments: Optional list of ClipSegment (or (start, end) pairs). When set,
+                  only those time ranges (plus padding) are downloaded.
+        padding: Seconds added around each segment in range mode.
+        format_policy: Name of a FORMAT_POLICIES entry controlling how
+                       resolution is traded against decode cost.
+        progress: Optional DownloadProgress that receives byte progress and
+                  is told which source time ranges are ready (per section
+                  in range mode, so early segments can start processing).
+
+    Returns the file path in full mode. In range mode returns one dict per
+    segment: {'path': file, 'offset': seconds the file starts at in the
+    source}. If range fetching fails, falls back to a full download and every
+    segment maps to the full file with offset 0.
+
+    Full downloads are pinned in the source cache; call
+    release_cached_source(path) once the caller is done with it.
+    """
+    if not os.path.exists(output_dir):
+        os.makedirs(output_dir)
+
+    try:
+        if segments is not None:
+            return _download_segment_ranges(url, output_dir, resolution, cookies_file, segments, padding,
+                                            format_policy, progress)
+
+        final_path = _download_full_shared(url, output_dir, resolution, cookies_file, format_policy, progress)
+        if progress:
+            progress.mark_available(0.0, float('inf'), final_path)
+            progress.finish()
+        return final_path
+    except BaseException as e:
+        if progress:
+            progress.fail(e)
+        raise
+
+
+def _download_full_shared(url: str, output_dir: str, resolution: str, cookies_file: str, format_policy: str,
+                          progress: Optional[DownloadProgress]) -> str:
+    cached_path = lookup_cached_source(url, output_dir, resolution, format_policy)
+    if cached_path:
+        return cached_path
+
+    # Concurrent requests for the same video/resolution share one download
+    target_height = parse_target_height(resolution)
+    flight_key = ('full', extract_video_id(url) or url, target_height, format_policy)
+    final_path, is_leader = _single_flight(
+        flight_key,
+        lambda: _download_full(url, output_dir, resolution, cookies_file, format_policy, progress)
+    )
+    if not is_leader:
+        # The leader registered the file; take our own pin on it
+        return lookup_cached_source(url, output_dir, resolution, format_policy) or final_path
+    return final_path
+
+
+def _download_full(url: str, output_dir: str, resolution: str, cookies_file: str, format_policy: str,
+                   progress: Optional[DownloadProgress]) -> str:
+    # Another job may have finished this download while we queued for it
+    cached_path = lookup_cached_source(url, output_dir, resolution, format_policy)
+    if cached_path:
+        return cached_path
+
+    target_height = parse_target_height(resolution)
+    ydl_opts = {**_build_ydl_opts(output_dir, target_height, format_policy), **_progress_opts(progress)}
+    cookies_to_use = _resolve_cookies(cookies_file)
+
+    info = _download_with_cookie_fallback(url, ydl_opts, cookies_to_use, target_height, format_policy)
+    video_id = info['id']
+    ext = info['ext']
+    final_path = os.path.join(output_dir, f"{video_id}_{target_height}p_{format_policy}.{ext}")
+    print(f"✅ Download complete: {os.path.basename(final_path)}")
+    _register_cached_source(output_dir, url, target_height, format_policy, final_path, info)
+    return final_path
+
+
+def _download_segment_ranges(url: str, output_dir: str, resolution: str, cookies_file: str, segments: list, padding: float,
+                             format_policy: str, progress: Optional[DownloadProgress]) -> list:
+    # A cached full source beats any range download
+    cached_path = lookup_cached_source(url, output_dir, resolution, format_policy)
+    if cached_path:
+        if progress:
+            progress.mark_available(0.0, float('inf'), cached_path)
+            progress.finish()
+        return [{'path': cached_path, 'offset': 0.0} for _ in segments]
+
+    target_height = parse_target_height(resolution)
+    cookies_to_use = _resolve_cookies(cookies_file)
+    ranges, segment_to_range = plan_download_ranges(segments, padding)
+
+    # Sections cached by earlier range downloads are reused; only the rest is fetched
+    located = lookup_cached_ranges(url, output_dir, target_height, format_policy, ranges)
+    if progress:
+        for (start, end), hit in zip(ranges, located):
+            if hit:
+                progress.mark_available(start, end, *hit)
+    missing = [r for r, hit in zip(ranges, located) if hit is None]
+
+    try:
+        if missing:
+            flight_key = ('ranges', extract_video_id(url) or url, target_height, format_policy, tuple(missing))
+            paths, is_leader = _single_flight(
+                flight_key,
+                lambda: _download_sections(url, output_dir, target_height, cookies_to_use, missing, format_policy, progress)
+            )
+            print(f"✅ Range download complete: {len(paths)} file(s)")
+            if not is_leader:
+                # The leader registered the files; take our own pins on them
+                hits = lookup_cached_ranges(url, output_dir, target_height, format_policy, missing)
+                paths = [hit[0] if hit else path for hit, path in zip(hits, paths)]
+            fetched = iter(zip(missing, paths))
+            for r, hit in enumerate(located):
+                if hit is None:
+                    (start, _), path = next(fetched)
+                    located[r] = (path, start)
+                    if progress:
+                        progress.mark_available(ranges[r][0], ranges[r][1], path, start)
+        if progress:
+            progress.finish()
+        return [
+            {'path': located[r][0], 'offset': located[r][1]}
+            for r in segment_to_range
+        ]
+    except Exception as e:
+        print(f"⚠️  Range download failed: {e}")
+        print("🔄 Falling back to full download...")
+        for path in {hit[0] for hit in located if hit}:
+            release_cached_source(path)
 
+    full_path = download_youtube_video(url, output_dir, resolution, cookies_file, format_policy=format_policy,
+                                       progress=progress)
+    return [{'path': full_path, 'offset': 0.0} for _ in segments]
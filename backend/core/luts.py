@@ -0,0 +1,150 @@
+"""
+3D LUT color grading.
+
+Filter-chain presets are baked once into .cube LUTs (run the chain over a
+Hald CLUT identity image with FFmpeg) and cached on disk, so any preset -
+however many filters it has - renders as a single lut3d pass. Custom LUT
+presets can be registered from .cube files.
+"""
+import os
+import re
+import json
+import hashlib
+import threading
+
+import ffmpeg
+import numpy as np
+
+LUT_DIR = os.environ.get("LUT_DIR", os.path.join("temp", "luts"))
+# Hald level 8 = 64x64x64 LUT (512x512 identity image)
+LUT_HALD_LEVEL = 8
+CUSTOM_LUTS_MANIFEST = "custom_luts.json"
+CUSTOM_LUT_NAME_RE = re.compile(r"^[a-z0-9_]{1,40}$")
+
+_lut_lock = threading.Lock()
+
+
+def _baked_lut_path(name: str, filters: list) -> str:
+    # Keyed by the filter chain too, so editing a preset re-bakes it
+    digest = hashlib.sha1(json.dumps([LUT_HALD_LEVEL, filters], sort_keys=True).encode()).hexdigest()[:12]
+    return os.path.join(LUT_DIR, f"{name}_{digest}.cube")
+
+
+def write_cube(path: str, rgb: np.ndarray, size: int, title: str):
+    """Writes an (size^3, 3) array of 0-1 RGB values, red fastest, as a .cube file."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(f'TITLE "{title}"\n')
+        f.write(f"LUT_3D_SIZE {size}\n")
+        f.write("DOMAIN_MIN 0.0 0.0 0.0\nDOMAIN_MAX 1.0 1.0 1.0\n")
+        np.savetxt(f, rgb, fmt="%.6f")
+    os.replace(tmp_path, path)
+
+
+def bake_lut(name: str, filters: list) -> str:
+    """
+    Bakes a filter chain [(filter_name, params)] into a .cube 3D LUT and
+    returns its path; cached on disk after the first call.
+
+    The chain runs on FFmpeg's Hald CLUT identity image - in yuv444p, as
+    eq/hue would see it in a render - and the graded image is read back as
+    the LUT (Hald pixel order is already .cube order: red fastest).
+    """
+    path = _baked_lut_path(name, filters)
+    if os.path.exists(path):
+        return path
+
+    with _lut_lock:
+        if os.path.exists(path):
+            return path
+        os.makedirs(LUT_DIR, exist_ok=True)
+        print(f"Baking 3D LUT for preset '{name}'...")
+
+        video = ffmpeg.input(f"haldclutsrc=level={LUT_HALD_LEVEL}", f="lavfi").video.filter('format', 'yuv444p')
+        for filter_name, params in filters:
+            video = video.filter(filter_name, **params)
+        out, _ = (
+            video
+            .output('pipe:', format='rawvideo', pix_fmt='rgb24', **{'frames:v': 1})
+            .run(capture_stdout=True, capture_stderr=True)
+        )
+
+        size = LUT_HALD_LEVEL ** 2
+        rgb = np.frombuffer(out, dtype=np.uint8)[:size ** 3 * 3].reshape(-1, 3) / 255.0
+        write_cube(path, rgb, size, name)
+        return path
+
+
+def parse_cube(text: str) -> int:
+    """
+    Validates .cube file contents and returns LUT_3D_SIZE.
+    Raises ValueError for 1D LUTs, missing sizes or a wrong number of rows.
+    """
+    size = None
+    rows = 0
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        keyword = line.split()[0]
+        if keyword == "LUT_3D_SIZE":
+            size = int(line.split()[1])
+        elif keyword == "LUT_1D_SIZE":
+            raise ValueError("1D LUTs are not supported")
+        elif keyword[0].isdigit() or keyword[0] in "-.":
+            values = [float(v) for v in line.split()]
+            if len(values) != 3:
+                raise ValueError(f"Invalid LUT row: {line!r}")
+            rows += 1
+    if not size or not 2 <= size <= 256:
+        raise ValueError("Missing or invalid LUT_3D_SIZE")
+    if rows != size ** 3:
+        raise ValueError(f"Expected {size ** 3} LUT rows, found {rows}")
+    return size
+
+
+def _manifest_path() -> str:
+    return os.path.join(LUT_DIR, CUSTOM_LUTS_MANIFEST)
+
+
+def load_custom_luts() -> dict:
+    """Registered custom LUT presets: {name: {'path': ..., 'size': ...}}."""
+    path = _manifest_path()
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Custom LUT manifest unreadable ({e})")
+    return {}
+
+
+def register_custom_lut(name: str, cube_text: str) -> dict:
+    """Validates and stores a .cube file as custom grading preset `name`."""
+    if not CUSTOM_LUT_NAME_RE.match(name):
+        raise ValueError("LUT name must be 1-40 lowercase letters, digits or underscores")
+    size = parse_cube(cube_text)
+
+    with _lut_lock:
+        os.makedirs(LUT_DIR, exist_ok=True)
+        path = os.path.join(LUT_DIR, f"custom_{name}.cube")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(cube_text)
+        os.replace(tmp_path, path)
+
+        luts = load_custom_luts()
+        luts[name] = {'path': path, 'size': size}
+        manifest_tmp = _manifest_path() + ".tmp"
+        with open(manifest_tmp, "w", encoding="utf-8") as f:
+            json.dump(luts, f, indent=2)
+        os.replace(manifest_tmp, _manifest_path())
+    return luts[name]
+
+
+def custom_lut_path(name: str):
+    """Path of a registered custom LUT preset, or None."""
+    entry = load_custom_luts().get(name)
+    if entry and os.path.exists(entry['path']):
+        return entry['path']
+    return None
@@ -1,6 +1,17 @@
 import os
+import math
+import queue
+import shutil
+import threading
 import ffmpeg
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from statistics import NormalDist
 from typing import Optional
+from core.timecode import segment_bounds
+from core.trajectory import Trajectory
+from core import detection_cache, luts, scene_index
 
 def extract_highlight(video_path: str, start_time: str, end_time: str, output_path: str):
     """
@@ -20,6 +31,39 @@ def extract_highlight(video_path: str, start_time: str, end_time: str, output_pa
         print(f"FFmpeg Error: {e.stderr.decode('utf-8')}")
         raise
 
+def extract_highlights(video_path: str, segments: list, output_paths: list):
+    """
+    Cuts many segments of one source with a SINGLE FFmpeg process.
+    
+    Each segment is its own input of the process, seeked on the input side
+    exactly like extract_highlight (stream copy from the keyframe before the
+    start, pre-roll hidden by the edit list), so every output is identical to
+    an extract_highlight cut. Compared to calling extract_highlight per
+    segment this saves a process spawn per segment.
+    segments: list of ClipSegment or (start, end) pairs.
+    """
+    if not segments:
+        return []
+    
+    outputs = []
+    for (start, end), output_path in zip((segment_bounds(segment) for segment in segments), output_paths):
+        # Never an output-side -ss on a copied stream: it drops the keyframe
+        # and everything up to the next one
+        outputs.append(ffmpeg.input(video_path, ss=start, to=end).output(output_path, c="copy"))
+    
+    print(f"Cutting {len(segments)} segments in one FFmpeg pass")
+    try:
+        (
+            ffmpeg
+            .merge_outputs(*outputs)
+            .overwrite_output()
+            .run(capture_stdout=True, capture_stderr=True)
+        )
+        return output_paths
+    except ffmpeg.Error as e:
+        print(f"FFmpeg Error: {e.stderr.decode('utf-8')}")
+        raise
+
 import cv2
 import numpy as np
 
@@ -80,8 +124,38 @@ def detect_active_speaker_x(video_path: str, samples: int = 30) -> int:
     # Return MEDIAN center to avoid outliers (jitter)
     return int(np.median(centers))
 
-# Lazy load YOLO to avoid startup lag
-yolo_model = None
+SEEKABLE_FORMATS = ('mov', 'mp4', 'm4a', '3gp', 'matroska', 'webm')
+
+
+def source_seeks_well(video_path: str) -> bool:
+    """
+    True if the container has an index we can seek with accurately
+    (MP4/MOV/MKV/WebM with a known duration). Streams like MPEG-TS or FLV
+    should go through an intermediate cut file instead.
+    """
+    try:
+        probe = ffmpeg.probe(video_path)
+    except ffmpeg.Error:
+        return False
+    format_names = probe.get('format', {}).get('format_name', '').split(',')
+    has_duration = float(probe.get('format', {}).get('duration') or 0) > 0
+    return has_duration and any(name in SEEKABLE_FORMATS for name in format_names)
+
+
+COLOR_GRADING_PRESETS = {
+    'none': '',
+    # Cinematic Warm: warm tones, higher contrast
+    'cinematic_warm': 'eq=contrast=1.15:brightness=0.03:saturation=1.2:gamma=1.1',
+    # Cool Modern: blue/teal tones, desaturated
+    'cool_modern': 'eq=contrast=1.2:saturation=0.85:gamma_b=0.9:gamma_r=1.1',
+    # Vibrant: boosted saturation and contrast
+    'vibrant': 'eq=contrast=1.25:saturation=1.4:brightness=0.05:gamma=1.05',
+    # Matte Film: lifted blacks (faded look)
+    'matte_film': 'eq=contrast=0.85:saturation=0.8:gamma=1.15:brightness=0.05',
+    # B&W High Contrast
+    'bw_contrast': 'hue=s=0,eq=contrast=1.35:brightness=0.03:gamma=0.95'
+}
+
 
 def get_color_grading_filter(preset: str) -> str:
     """
@@ -95,244 +169,1026 @@ def get_color_grading_filter(preset: str) -> str:
     - matte_film: Lifted blacks, faded look (artistic)
     - bw_contrast: Black & white, high contrast (dramatic)
     """
-    presets = {
-        'none': '',
-        # Cinematic Warm: warm tones, higher contrast
-        'cinematic_warm': 'eq=contrast=1.15:brightness=0.03:saturation=1.2:gamma=1.1',
-        # Cool Modern: blue/teal tones, desaturated
-        'cool_modern': 'eq=contrast=1.2:saturation=0.85:gamma_b=0.9:gamma_r=1.1',
-        # Vibrant: boosted saturation and contrast
-        'vibrant': 'eq=contrast=1.25:saturation=1.4:brightness=0.05:gamma=1.05',
-        # Matte Film: lifted blacks (faded look)
-        'matte_film': 'eq=contrast=0.85:saturation=0.8:gamma=1.15:brightness=0.05',
-        # B&W High Contrast
-        'bw_contrast': 'hue=s=0,eq=contrast=1.35:brightness=0.03:gamma=0.95'
-    }
-    return presets.get(preset, '')
+    return COLOR_GRADING_PRESETS.get(preset, '')
+
 
-def detect_visual_interest_x(video_path: str, samples: int = 30) -> int:
+# Frames between detector samples
+DETECTION_FRAME_INTERVAL = 15
+# At or above this interval, seeking to each sample beats decoding through
+# the skipped frames (roughly one GOP of typical web video)
+SEEK_SAMPLING_MIN_INTERVAL = 60
+
+
+class SampledFrameReader:
     """
-    Detects the 'Center of Visual Interest' using YOLOv8 AI.
-    Prioritizes:
-    1. Held Objects (Book, Cell Phone, Laptop, Bottle, Cup, Remote)
-    2. Persons (if no objects found)
+    Yields (frame_num, frame_rgb) for every `frame_interval`-th frame of a clip
+    window, decoding only what it has to. OpenCV-based frame source, used
+    when the ffmpeg binary isn't available (see open_frame_source).
+    
+    Modes:
+    - 'grab': skipped frames go through cap.grab() only - no retrieve(), so
+      no BGR conversion or frame copy for frames nobody looks at.
+    - 'seek': jump straight to each sample (keyframe seek + decode of at most
+      one GOP). Cheaper once samples are more than a GOP apart.
+    - 'auto': 'seek' if frame_interval >= SEEK_SAMPLING_MIN_INTERVAL, else 'grab'.
+    
+    start/end (seconds) restrict reading to a window; frame numbers are
+    relative to start. Frames are full resolution RGB written into one reused
+    buffer - copy a frame if you need to keep it past the next iteration.
+    
+    Set `frames` (window-relative frame numbers) before iterating to read
+    exactly those frames, in that order, by seeking.
     """
+    
+    def __init__(self, video_path: str, frame_interval: int = DETECTION_FRAME_INTERVAL,
+                 start: float = None, end: float = None, mode: str = 'auto'):
+        self.cap = cv2.VideoCapture(video_path)
+        self.frame_interval = max(1, frame_interval)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        # Delivered frames are source-sized: detections need no rescaling
+        self.frame_width, self.frame_height = self.width, self.height
+        self.scale_x = self.scale_y = 1.0
+        self.start = start or 0.0
+        self.frames = None
+        self._rgb = None
+        
+        if end is not None:
+            self.total_frames = max(0, int((end - self.start) * self.fps))
+        else:
+            self.total_frames = max(0, int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT)) - int(self.start * self.fps))
+        
+        if mode == 'auto':
+            mode = 'seek' if self.frame_interval >= SEEK_SAMPLING_MIN_INTERVAL else 'grab'
+        self.mode = mode
+        
+        if self.start:
+            self.cap.set(cv2.CAP_PROP_POS_MSEC, self.start * 1000)
+        # Absolute frame index of the window's first frame (for seek mode)
+        self._first_frame = int(round(self.start * self.fps))
+    
+    def __iter__(self):
+        if self.mode == 'seek' or self.frames is not None:
+            yield from self._iter_seek()
+        else:
+            yield from self._iter_grab()
+    
+    def _iter_grab(self):
+        for frame_num in range(self.total_frames):
+            if frame_num % self.frame_interval != 0:
+                if not self.cap.grab():
+                    return
+                continue
+            ret, frame = self.cap.read()
+            if not ret:
+                return
+            yield frame_num, self._to_rgb(frame)
+    
+    def _to_rgb(self, frame):
+        # Convert into a reused buffer instead of allocating a copy per frame
+        if self._rgb is None or self._rgb.shape != frame.shape:
+            self._rgb = np.empty_like(frame)
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb)
+    
+    def _iter_seek(self):
+        frames = self.frames if self.frames is not None else range(0, self.total_frames, self.frame_interval)
+        for frame_num in frames:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self._first_frame + frame_num)
+            ret, frame = self.cap.read()
+            if not ret:
+                continue
+            yield frame_num, self._to_rgb(frame)
+    
+    def close(self):
+        self.cap.release()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
 
-def detect_faces_mediapipe(video_path: str, width: int, height: int) -> Optional[dict]:
+# Width frames are delivered at for detection. BlazeFace and YOLOv8n both
+# downscale internally (128px / 640px inputs), so full HD decode is wasted.
+DETECTION_MAX_WIDTH = 640
+
+
+class FfmpegFrameSource:
     """
-    Detect faces using MediaPipe Face Detection - MUCH more accurate!
-    Returns dict with per-frame positions AND face widths for safety margins.
+    Frame source that lets ffmpeg do the heavy lifting: seek, keep every
+    `frame_interval`-th frame (framestep), scale to detector resolution and
+    convert to rgb24 - all before the frames reach Python over a pipe.
+    
+    Frames are np.frombuffer views on ONE reused buffer (no per-frame
+    allocation); copy a frame if you need it after the next iteration.
+    Detections made on a frame map back to source pixels via scale_x/scale_y.
+    Same interface as SampledFrameReader, including `frames` (explicit,
+    ascending window-relative frame numbers, picked by a select filter).
     """
-    try:
-        import mediapipe as mp
-        from mediapipe.tasks import python
-        from mediapipe.tasks.python import vision
-        import urllib.request
-        import os
-        
-        # Download model if not exists
-        model_path = "detector.tflite"
-        if not os.path.exists(model_path):
-            print("  Downloading MediaPipe face detection model...")
-            url = "https://storage.googleapis.com/mediapipe-models/face_detector/blaze_face_short_range/float16/1/blaze_face_short_range.tflite"
-            urllib.request.urlretrieve(url, model_path)
-        
-        # Create FaceDetector
-        base_options = python.BaseOptions(model_asset_path=model_path)
-        options = vision.FaceDetectorOptions(
-            base_options=base_options,
-            min_detection_confidence=0.5
+    
+    def __init__(self, video_path: str, frame_interval: int = DETECTION_FRAME_INTERVAL,
+                 start: float = None, end: float = None, max_width: int = DETECTION_MAX_WIDTH):
+        probe = ffmpeg.probe(video_path)
+        stream = next(st for st in probe['streams'] if st['codec_type'] == 'video')
+        num, den = stream['r_frame_rate'].split('/')
+        
+        self.video_path = video_path
+        self.frame_interval = max(1, frame_interval)
+        self.fps = float(num) / float(den) if float(den) else 30.0
+        self.width = int(stream['width'])
+        self.height = int(stream['height'])
+        self.start = start or 0.0
+        self.end = end
+        
+        duration = (end if end is not None else float(probe['format'].get('duration') or 0)) - self.start
+        self.total_frames = max(0, int(duration * self.fps))
+        
+        # Even dimensions keep every scaler happy
+        self.frame_width = min(self.width, max_width) // 2 * 2
+        self.frame_height = int(round(self.height * self.frame_width / self.width)) // 2 * 2
+        self.scale_x = self.width / self.frame_width
+        self.scale_y = self.height / self.frame_height
+        
+        self._buffer = bytearray(self.frame_width * self.frame_height * 3)
+        self._frame = np.frombuffer(self._buffer, dtype=np.uint8).reshape(self.frame_height, self.frame_width, 3)
+        self._process = None
+        self.frames = None
+    
+    def __iter__(self):
+        input_args = {}
+        if self.start:
+            input_args['ss'] = self.start
+        if self.end is not None:
+            input_args['to'] = self.end
+        video = ffmpeg.input(self.video_path, **input_args).video
+        if self.frames is not None:
+            frames = sorted(self.frames)
+            if not frames:
+                return
+            # not(n-k) is 1 only on frame k - a comma-free select expression
+            video = video.filter('select', '+'.join(f'not(n-{f})' for f in frames))
+        else:
+            frames = None
+            video = video.filter('framestep', self.frame_interval)
+        self._process = (
+            video
+            .filter('scale', self.frame_width, self.frame_height)
+            .output('pipe:', format='rawvideo', pix_fmt='rgb24', vsync=0)
+            .global_args('-loglevel', 'error', '-nostdin')
+            .run_async(pipe_stdout=True)
         )
-        detector = vision.FaceDetector.create_from_options(options)
         
-        cap = cv2.VideoCapture(video_path)
-        frame_interval = 15
-        frame_num = 0
-        frame_positions = []
+        view = memoryview(self._buffer)
+        frame_size = len(self._buffer)
+        sample = 0
+        try:
+            while True:
+                # Pipes return short reads - keep filling until a whole frame is in
+                filled = 0
+                while filled < frame_size:
+                    n = self._process.stdout.readinto(view[filled:])
+                    if not n:
+                        return
+                    filled += n
+                if frames is None:
+                    yield sample * self.frame_interval, self._frame
+                elif sample < len(frames):
+                    yield frames[sample], self._frame
+                sample += 1
+        finally:
+            self.close()
+    
+    def close(self):
+        if self._process is not None:
+            self._process.stdout.close()
+            if self._process.poll() is None:
+                self._process.kill()
+            self._process.wait()
+            self._process = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_frame_source(video_path: str, frame_interval: int = DETECTION_FRAME_INTERVAL,
+                      start: float = None, end: float = None, max_width: int = DETECTION_MAX_WIDTH):
+    """
+    Returns the fastest available frame source for detection: downscaled
+    rgb24 over an ffmpeg pipe, or OpenCV sampled decoding without ffmpeg.
+    """
+    if shutil.which('ffmpeg'):
+        return FfmpegFrameSource(video_path, frame_interval, start, end, max_width)
+    return SampledFrameReader(video_path, frame_interval, start, end)
+
+
+# Average face confidence below which a clip falls back to body tracking
+FACE_MIN_CONFIDENCE = 0.3
+
+
+# Model files live next to main.py, independent of the working directory
+MODELS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FACE_MODEL_PATH = os.path.join(MODELS_DIR, "detector.tflite")
+FACE_MODEL_URL = "https://storage.googleapis.com/mediapipe-models/face_detector/blaze_face_short_range/float16/1/blaze_face_short_range.tflite"
+BODY_MODEL_PATH = os.path.join(MODELS_DIR, "yolov8n.pt")
+
+# Max instances of each detector per worker process (= concurrent detections)
+DETECTOR_POOL_SIZE = int(os.environ.get("DETECTOR_POOL_SIZE", "2"))
+
+_face_model_lock = threading.Lock()
+
+
+def _create_face_detector():
+    """Creates a MediaPipe FaceDetector, downloading the model on first use."""
+    from mediapipe.tasks import python
+    from mediapipe.tasks.python import vision
+    import urllib.request
+    
+    with _face_model_lock:
+        if not os.path.exists(FACE_MODEL_PATH):
+            print("  Downloading MediaPipe face detection model...")
+            tmp_path = FACE_MODEL_PATH + ".part"
+            urllib.request.urlretrieve(FACE_MODEL_URL, tmp_path)
+            os.replace(tmp_path, FACE_MODEL_PATH)
+    
+    # Create FaceDetector
+    base_options = python.BaseOptions(model_asset_path=FACE_MODEL_PATH)
+    options = vision.FaceDetectorOptions(
+        base_options=base_options,
+        min_detection_confidence=0.5
+    )
+    return vision.FaceDetector.create_from_options(options)
+
+
+def _create_body_detector():
+    from ultralytics import YOLO
+    # ultralytics downloads the weights itself if they are missing
+    return YOLO(BODY_MODEL_PATH if os.path.exists(BODY_MODEL_PATH) else 'yolov8n.pt')
+
+
+class DetectorPool:
+    """
+    Lazily created, reusable instances of one detector. Neither MediaPipe's
+    FaceDetector nor a YOLO predictor is safe to share between threads, so
+    each job checks an instance out exclusively; up to `size` instances are
+    created and further jobs wait for one to be returned.
+    """
+    
+    def __init__(self, name: str, factory, size: int = DETECTOR_POOL_SIZE):
+        self.name = name
+        self._factory = factory
+        self._size = max(1, size)
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def checkout(self):
+        instance = self._acquire()
+        try:
+            yield instance
+        finally:
+            self._idle.put(instance)
+    
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
         
-        print("  Detecting faces with MediaPipe (accurate bounding boxes)...")
+        with self._lock:
+            create = self._created < self._size
+            if create:
+                self._created += 1
+        if not create:
+            return self._idle.get()
         
+        try:
+            return self._factory()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+    
+    def close(self):
         while True:
-            ret, frame = cap.read()
-            if not ret:
+            try:
+                instance = self._idle.get_nowait()
+            except queue.Empty:
                 break
-            
-            if frame_num % frame_interval != 0:
-                frame_num += 1
-                continue
-            
-            # Convert to RGB and create MediaPipe Image
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=frame_rgb)
-            
-            # Detect faces
-            detection_result = detector.detect(mp_image)
-            
-            if detection_result.detections:
-                # Pick best detection
-                best_detection = None
-                best_score = -1
-                
-                for detection in detection_result.detections:
-                    score = detection.categories[0].score
-                    
-                    # Get bounding box
-                    bbox = detection.bounding_box
-                    x = bbox.origin_x
-                    y = bbox.origin_y
-                    w = bbox.width
-                    h = bbox.height
-                    
-                    # Filter: upper region priority
-                    center_y = y + h/2
-                    if center_y > height * 0.7:
-                        continue
-                    
-                    # Calculate face center
-                    center_x = x + w/2
-                    
-                    # Score based on size and position
-                    area = w * h
-                    distance_from_center = abs(center_x - width/2)
-                    centrality = 1.0 - (distance_from_center / (width/2))
-                    combined_score = (area * 0.7) + (centrality * 1000) + (score * 500)
-                    
-                    if combined_score > best_score:
-                        best_score = combined_score
-                        best_detection = {
-                            'center_x': center_x,
-                            'face_width': w,
-                            'confidence': score,
-                            'bbox': (x, y, w, h)
-                        }
-                
-                if best_detection:
-                    frame_positions.append((
-                        frame_num,
-                        best_detection['center_x'],
-                        best_detection['face_width'],
-                        best_detection['confidence']
-                    ))
-            
-            frame_num += 1
+            if hasattr(instance, 'close'):
+                instance.close()
+            with self._lock:
+                self._created -= 1
+
+
+class DetectorRegistry:
+    """
+    Per-process home of the detection models: loaded once, warmed up at
+    worker start and handed out through DetectorPool.checkout().
+    """
+    
+    def __init__(self, pool_size: int = DETECTOR_POOL_SIZE):
+        self.face = DetectorPool('face', _create_face_detector, pool_size)
+        self.body = DetectorPool('body', _create_body_detector, pool_size)
+    
+    def warm_up(self):
+        """
+        Loads one instance of each detector and runs it on a blank frame, so
+        model download, init and first-inference costs are paid at startup
+        instead of by the first clip.
+        """
+        frame = np.zeros((360, DETECTION_MAX_WIDTH, 3), dtype=np.uint8)
+        try:
+            import mediapipe as mp
+            with self.face.checkout() as detector:
+                detector.detect(mp.Image(image_format=mp.ImageFormat.SRGB, data=frame))
+            print("✓ Face detector ready")
+        except Exception as e:
+            print(f"⚠ Face detector warm-up failed: {e}")
+        try:
+            with self.body.checkout() as model:
+                model(frame, verbose=False)
+            print("✓ Body detector ready")
+        except Exception as e:
+            print(f"⚠ Body detector warm-up failed: {e}")
+    
+    def close(self):
+        self.face.close()
+        self.body.close()
+
+
+detector_registry = DetectorRegistry()
+
+
+def _best_face(detector, frame_rgb, source, width: int, height: int, offset: tuple = (0, 0)) -> Optional[tuple]:
+    """
+    Runs face detection on one RGB frame.
+    Returns (center_x, face_width, confidence, bbox) in source pixels, or None.
+    offset: (x, y) of frame_rgb within the full frame when it is a crop (ROI).
+    """
+    import mediapipe as mp
+    
+    # Frames arrive as RGB already - wrap without converting
+    mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=frame_rgb)
+    detection_result = detector.detect(mp_image)
+    
+    # Pick best detection
+    best_detection = None
+    best_score = -1
+    
+    for detection in detection_result.detections:
+        score = detection.categories[0].score
         
-        cap.release()
-        detector.close()
+        # Get bounding box (mapped back to source pixels)
+        bbox = detection.bounding_box
+        x = (bbox.origin_x + offset[0]) * source.scale_x
+        y = (bbox.origin_y + offset[1]) * source.scale_y
+        w = bbox.width * source.scale_x
+        h = bbox.height * source.scale_y
         
-        if len(frame_positions) > 0:
-            print(f"  Found {len(frame_positions)} face frames with bounding boxes")
-            
-            # Calculate average face width
-            avg_face_width = sum(w for _, _, w, _ in frame_positions) / len(frame_positions)
-            
-            return {
-                'positions': frame_positions,
-                'method': 'mediapipe_face',
-                'confidence': sum(c for _, _, _, c in frame_positions) / len(frame_positions),
-                'avg_face_width': avg_face_width
-            }
-        
-        print("  No faces detected - will try body tracking")
-        return None
+        # Filter: upper region priority
+        center_y = y + h/2
+        if center_y > height * 0.7:
+            continue
         
-    except Exception as e:
-        print(f"  MediaPipe face detection error: {e}")
-        import traceback
-        traceback.print_exc()
+        # Calculate face center
+        center_x = x + w/2
+        
+        # Score based on size and position
+        area = w * h
+        distance_from_center = abs(center_x - width/2)
+        centrality = 1.0 - (distance_from_center / (width/2))
+        combined_score = (area * 0.7) + (centrality * 1000) + (score * 500)
+        
+        if combined_score > best_score:
+            best_score = combined_score
+            best_detection = (center_x, w, score, (x, y, w, h))
+    
+    return best_detection
+
+
+# Frames per batched YOLO inference call in the body-tracking fallback
+BODY_BATCH_SIZE = int(os.environ.get("BODY_BATCH_SIZE", "8"))
+
+
+def _best_bodies(model, frames_bgr: list, source, width: int, height: int) -> list:
+    """
+    Runs person detection on a batch of BGR frames in one inference call.
+    Returns one (center_x, 0, confidence) tuple in source pixels - or None -
+    per frame.
+    """
+    results = model(frames_bgr, verbose=False)
+    
+    # All boxes of the batch as one (n, 6) array: x1, y1, x2, y2, conf, cls
+    arrays = [r.boxes.data.cpu().numpy() for r in results]
+    counts = [len(a) for a in arrays]
+    if not sum(counts):
+        return [None] * len(frames_bgr)
+    data = np.concatenate(arrays)
+    frame_idx = np.repeat(np.arange(len(arrays)), counts)
+    
+    # Map back to source pixels
+    x1 = data[:, 0] * source.scale_x
+    x2 = data[:, 2] * source.scale_x
+    y1 = data[:, 1] * source.scale_y
+    y2 = data[:, 3] * source.scale_y
+    
+    center_x = (x1 + x2) / 2
+    center_y = (y1 + y2) / 2
+    area = (x2 - x1) * (y2 - y1)
+    
+    # Score: favor larger + more centered
+    distance_from_center = np.abs(center_x - width/2)
+    centrality_bias = (1.0 - distance_from_center / (width/2)) * area * 0.3
+    score = area + centrality_bias
+    
+    # Only persons, upper region priority
+    keep = (data[:, 5] == 0) & (center_y <= height * 0.7) & (center_x != 0)
+    score = np.where(keep, score, -np.inf)
+    
+    # Best box per frame: sort by (frame, -score) and take each frame's first row
+    order = np.lexsort((-score, frame_idx))
+    first = np.unique(frame_idx[order], return_index=True)[1]
+    best_rows = order[first]
+    
+    bodies = [None] * len(frames_bgr)
+    for row in best_rows[np.isfinite(score[best_rows])]:
+        # Placeholder face_width (0) to match MediaPipe format
+        bodies[frame_idx[row]] = (float(center_x[row]), 0, min(1.0, float(score[row]) / 100000))
+    return bodies
+
+
+# Detection modes: 'dense' runs the detector on every sampled frame, 'tracked'
+# runs it on sparse anchors and follows the face with optical flow in between,
+# 'roi' searches only a window around the last face once locked on, 'converge'
+# samples in stratified order and stops once the static crop center is stable,
+# 'adaptive' spreads samples per shot using the source's scene-cut index
+DETECTION_MODES = ('dense', 'tracked', 'roi', 'converge', 'adaptive')
+TRACK_FRAME_INTERVAL = 5    # sampling interval while tracking (divides DETECTION_FRAME_INTERVAL)
+TRACK_ANCHOR_INTERVAL = 90  # frames between forced re-detections (~3s @ 30fps)
+TRACK_MIN_POINTS = 6
+TRACK_MIN_CONFIDENCE = 0.5  # fraction of flow points that must survive a step
+TRACK_MAX_FB_ERROR = 1.0    # forward-backward flow error (px) for a point to count
+SHOT_CUT_CORRELATION = 0.6  # grey histogram correlation below this = shot cut
+ROI_PADDING = 1.5           # ROI = last face box grown by this many box sizes per side
+ROI_MIN_SIZE = 192          # px (frame pixels) - BlazeFace needs some context
+CONVERGE_TOLERANCE_PX = 8   # source px - allowed error of the static crop center
+CONVERGE_CONFIDENCE = 0.95
+CONVERGE_MIN_SAMPLES = 8
+SHOT_SAMPLE_SECONDS = 1.0   # adaptive mode: one sample per second of shot...
+SHOT_MIN_SAMPLES = 3        # ...but at least this many per shot
+LK_PARAMS = dict(winSize=(15, 15), maxLevel=2,
+                 criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03))
+
+
+def stratified_frames(total_frames: int, frame_interval: int = DETECTION_FRAME_INTERVAL) -> list:
+    """
+    The DETECTION_FRAME_INTERVAL sample grid of a clip in bit-reversal order:
+    start, middle, quarters, eighths, ... so every prefix of the list covers
+    the whole clip about evenly.
+    """
+    count = (total_frames + frame_interval - 1) // frame_interval
+    bits = max(1, (count - 1).bit_length())
+    order = []
+    for i in range(1 << bits):
+        sample = int(format(i, f'0{bits}b')[::-1], 2)
+        if sample < count:
+            order.append(sample * frame_interval)
+    return order
+
+
+def plan_shot_samples(cut_frames: list, total_frames: int, fps: float,
+                      sample_seconds: float = SHOT_SAMPLE_SECONDS, min_samples: int = SHOT_MIN_SAMPLES) -> list:
+    """
+    Sample frames allocated per shot instead of per fixed stride: each shot
+    gets one sample per `sample_seconds` but at least `min_samples`, spread
+    evenly and away from the cut frames themselves. Long static shots get
+    fewer samples than the 15-frame grid, fast edits more.
+    cut_frames: window-relative frames where new shots begin.
+    """
+    bounds = [0] + sorted(f for f in cut_frames if 0 < f < total_frames) + [total_frames]
+    frames = []
+    for shot_start, shot_end in zip(bounds, bounds[1:]):
+        length = shot_end - shot_start
+        if length <= 0:
+            continue
+        count = min(length, max(min_samples, math.ceil(length / fps / sample_seconds)))
+        frames.extend(shot_start + int((i + 0.5) * length / count) for i in range(count))
+    return sorted(set(frames))
+
+
+def converged_center(xs: list, tolerance_px: float = CONVERGE_TOLERANCE_PX,
+                     confidence: float = CONVERGE_CONFIDENCE) -> Optional[float]:
+    """
+    Sequential estimate of the static crop center: the 20% trimmed mean that
+    auto_reframe uses. Returns it once its confidence interval at
+    `confidence` is narrower than +-tolerance_px, else None.
+    """
+    if len(xs) < CONVERGE_MIN_SAMPLES:
         return None
+    values = np.sort(np.asarray(xs, dtype=np.float64))
+    trim = int(len(values) * 0.2)
+    if trim:
+        values = values[trim:-trim]
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    half_width = z * values.std(ddof=1) / math.sqrt(len(values)) if len(values) > 1 else float('inf')
+    if half_width > tolerance_px:
+        return None
+    return float(values.mean())
+
+
+class ShotCutDetector:
+    """Flags hard cuts between consecutive sampled frames by grey histogram correlation."""
+    
+    def __init__(self, threshold: float = SHOT_CUT_CORRELATION):
+        self.threshold = threshold
+        self.cuts = 0
+        self._hist = None
+    
+    def update(self, gray) -> bool:
+        hist = cv2.calcHist([gray], [0], None, [32], [0, 256])
+        cv2.normalize(hist, hist)
+        cut = self._hist is not None and cv2.compareHist(self._hist, hist, cv2.HISTCMP_CORREL) < self.threshold
+        self._hist = hist
+        if cut:
+            self.cuts += 1
+        return cut
 
 
-def detect_body_positions(video_path: str, width: int, height: int) -> Optional[dict]:
+def roi_window(box: tuple, frame_width: int, frame_height: int, padding: float = ROI_PADDING) -> tuple:
     """
-    Detect person body positions using YOLO as fallback when face detection fails.
-    Returns dict with per-frame positions for profile views.
+    Padded search window (x0, y0, x1, y1) around a face box (x, y, w, h),
+    clipped to the frame. All values in frame pixels.
     """
-    global yolo_model
-    try:
-        if yolo_model is None:
-            from ultralytics import YOLO
-            yolo_model = YOLO('yolov8n.pt')
+    x, y, w, h = box
+    half_w = max(w * (0.5 + padding), ROI_MIN_SIZE / 2)
+    half_h = max(h * (0.5 + padding), ROI_MIN_SIZE / 2)
+    cx, cy = x + w/2, y + h/2
+    x0 = int(max(0, cx - half_w))
+    y0 = int(max(0, cy - half_h))
+    x1 = int(min(frame_width, cx + half_w))
+    y1 = int(min(frame_height, cy + half_h))
+    return x0, y0, x1, y1
+
+
+class FaceBoxTracker:
+    """
+    Follows a detected face box between detector anchors with pyramidal
+    Lucas-Kanade optical flow on grey frames.
+    
+    advance() is fed every sampled frame and says whether the detector has to
+    run on it: on a shot cut, when the flow points are lost, when the anchor
+    is older than anchor_interval, or - with no face being tracked - on the
+    regular DETECTION_FRAME_INTERVAL grid. When it returns False, `box` is
+    the tracked box for the frame, or None if there is nothing to track.
+    anchor() restarts tracking from a detector box. Boxes are (x, y, w, h)
+    in frame (not source) pixels.
+    """
+    
+    def __init__(self, anchor_interval: int = TRACK_ANCHOR_INTERVAL):
+        self.anchor_interval = anchor_interval
+        self.box = None
+        self.score = 0.0
+        self.track_confidence = 0.0
+        self.shot_cuts = ShotCutDetector()
+        self._points = None
+        self._gray = None
+        self._anchor_frame = 0
+    
+    def advance(self, frame_rgb, frame_num: int) -> bool:
+        prev_gray = self._gray
+        self._gray = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2GRAY)
         
-        cap = cv2.VideoCapture(video_path)
-        frame_interval = 15
-        frame_num = 0
-        frame_positions = []
+        if self.shot_cuts.update(self._gray):
+            self.box = None
+            return True
+        if self.box is None:
+            return frame_num % DETECTION_FRAME_INTERVAL == 0
+        if frame_num - self._anchor_frame >= self.anchor_interval:
+            return True
+        return not self._track(prev_gray)
+    
+    def _track(self, prev_gray) -> bool:
+        points = self._points
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, self._gray, points, None, **LK_PARAMS)
+        back, status_back, _ = cv2.calcOpticalFlowPyrLK(self._gray, prev_gray, moved, None, **LK_PARAMS)
+        fb_error = np.linalg.norm((points - back).reshape(-1, 2), axis=1)
+        good = (status.ravel() == 1) & (status_back.ravel() == 1) & (fb_error < TRACK_MAX_FB_ERROR)
         
-        print("  Detecting body positions (profile view fallback)...")
+        self.track_confidence = good.sum() / len(points)
+        if good.sum() < TRACK_MIN_POINTS or self.track_confidence < TRACK_MIN_CONFIDENCE:
+            self.box = None
+            return False
         
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                break
-            
-            if frame_num % frame_interval != 0:
-                frame_num += 1
-                continue
-            
-            # Run YOLO detection
-            results = yolo_model(frame, verbose=False)
+        dx, dy = np.median((moved - points).reshape(-1, 2)[good], axis=0)
+        x, y, w, h = self.box
+        self.box = (x + dx, y + dy, w, h)
+        self._points = moved[good].reshape(-1, 1, 2)
+        return True
+    
+    def anchor(self, frame_num: int, box: Optional[tuple], score: float = 0.0):
+        """Restarts tracking from a detector box on the current frame (None drops the track)."""
+        self._anchor_frame = frame_num
+        self.box = None
+        self._points = None
+        if box is None:
+            return
+        
+        x, y, w, h = (int(round(v)) for v in box)
+        mask = np.zeros_like(self._gray)
+        mask[max(0, y):max(0, y + h), max(0, x):max(0, x + w)] = 255
+        points = cv2.goodFeaturesToTrack(self._gray, maxCorners=50, qualityLevel=0.01, minDistance=3, mask=mask)
+        if points is None or len(points) < TRACK_MIN_POINTS:
+            return
+        self.box = box
+        self.score = score
+        self.track_confidence = 1.0
+        self._points = points.astype(np.float32)
+
+
+def _summarize_positions(positions: list, method: str) -> Optional[dict]:
+    if not positions:
+        return None
+    return {
+        'positions': positions,
+        'method': method,
+        'confidence': sum(c for _, _, _, c in positions) / len(positions),
+        'avg_face_width': sum(w for _, _, w, _ in positions) / len(positions)
+    }
+
+
+def detect_subjects(video_path: str, width: int, height: int, start: float = None, end: float = None,
+                    detectors: tuple = ('face', 'body'), body_batch_size: int = BODY_BATCH_SIZE,
+                    mode: str = 'dense', tolerance_px: float = CONVERGE_TOLERANCE_PX,
+                    confidence: float = CONVERGE_CONFIDENCE) -> Optional[dict]:
+    """
+    Single detection pass: every sampled frame is decoded once and handed to
+    the enabled detectors.
+    
+    Face detection runs on every frame. Body detection (YOLO) runs lazily -
+    only on frames with no usable face, and only until a confident face has
+    been seen (after that the clip is guaranteed to use the face result, so
+    body boxes would be thrown away).
+    
+    mode='tracked' samples every TRACK_FRAME_INTERVAL frames but only runs
+    the face detector on anchors (see FaceBoxTracker) - 3x denser positions
+    for a fraction of the detector calls. Body detection keeps the regular
+    DETECTION_FRAME_INTERVAL grid.
+    
+    mode='roi' runs the face detector on a padded window around the last
+    face (roi_window) and falls back to a full-frame search on a miss or a
+    shot cut. ROI hit/miss counts are returned under 'roi_stats'.
+    
+    mode='converge' reads the sample grid in stratified order
+    (stratified_frames) and stops as soon as the static crop center has
+    converged to +-tolerance_px at `confidence` (converged_center). The
+    estimate is returned under 'convergence'.
+    
+    Returns the face result when a confident face was found, otherwise the
+    body result (same format as detect_faces_mediapipe / detect_body_positions).
+    """
+    if mode not in DETECTION_MODES:
+        raise ValueError(f"Unknown detection mode: {mode!r}")
+    tracked = mode == 'tracked' and 'face' in detectors
+    converge = mode == 'converge'
+    if converge:
+        # Out-of-order samples need random access
+        reader = SampledFrameReader(video_path, DETECTION_FRAME_INTERVAL, start, end, mode='seek')
+        reader.frames = stratified_frames(reader.total_frames)
+    elif mode == 'adaptive':
+        reader = open_frame_source(video_path, DETECTION_FRAME_INTERVAL, start, end)
+        window_start = start or 0.0
+        try:
+            cuts = scene_index.scene_cuts(video_path, window_start, window_start + reader.total_frames / reader.fps)
+        except (ffmpeg.Error, OSError) as e:
+            print(f"  Scene index unavailable ({e}) - treating the clip as one shot")
+            cuts = []
+        reader.frames = plan_shot_samples(
+            [int(round((t - window_start) * reader.fps)) for t in cuts], reader.total_frames, reader.fps
+        )
+        print(f"  Adaptive sampling: {len(cuts) + 1} shots, {len(reader.frames)} samples "
+              f"(fixed stride: {math.ceil(reader.total_frames / DETECTION_FRAME_INTERVAL)})")
+    else:
+        frame_interval = TRACK_FRAME_INTERVAL if tracked else DETECTION_FRAME_INTERVAL
+        reader = open_frame_source(video_path, frame_interval, start, end)
+    
+    stack = ExitStack()
+    face_detector = None
+    if 'face' in detectors:
+        try:
+            face_detector = stack.enter_context(detector_registry.face.checkout())
+        except Exception as e:
+            print(f"  MediaPipe face detection error: {e}")
+    use_body = 'body' in detectors
+    model = None
+    
+    face_positions = []
+    body_positions = []
+    face_locked = False
+    tracker = FaceBoxTracker() if tracked and face_detector is not None else None
+    samples = 0
+    detector_calls = 0
+    center_estimate = None
+    
+    # ROI mode state: last face box (frame pixels) and hit/miss bookkeeping
+    roi_box = None
+    roi_cuts = ShotCutDetector() if mode == 'roi' else None
+    roi_stats = {'roi_searches': 0, 'roi_misses': 0, 'full_searches': 0, 'roi_area_sum': 0.0}
+    
+    def find_face(frame_rgb):
+        nonlocal roi_box
+        face = None
+        if roi_cuts is not None and roi_cuts.update(cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2GRAY)):
+            roi_box = None
+        if roi_box is not None:
+            x0, y0, x1, y1 = roi_window(roi_box, reader.frame_width, reader.frame_height)
+            roi_stats['roi_searches'] += 1
+            roi_stats['roi_area_sum'] += (x1 - x0) * (y1 - y0) / (reader.frame_width * reader.frame_height)
+            # MediaPipe needs a contiguous image - the crop copy is small
+            crop = np.ascontiguousarray(frame_rgb[y0:y1, x0:x1])
+            face = _best_face(face_detector, crop, reader, width, height, offset=(x0, y0))
+            if not face:
+                roi_stats['roi_misses'] += 1
+        if not face:
+            roi_stats['full_searches'] += 1
+            face = _best_face(face_detector, frame_rgb, reader, width, height)
+        if roi_cuts is not None:
+            roi_box = None
+            if face:
+                x, y, w, h = face[3]
+                roi_box = (x / reader.scale_x, y / reader.scale_y, w / reader.scale_x, h / reader.scale_y)
+        return face
+    
+    # Frames waiting for the next batched YOLO call
+    batch_size = max(1, body_batch_size)
+    body_batch = None
+    body_frames = []
+    
+    def run_body_batch():
+        nonlocal model, use_body
+        try:
+            if model is None:
+                model = stack.enter_context(detector_registry.body.checkout())
+            bodies = _best_bodies(model, list(body_batch[:len(body_frames)]), reader, width, height)
+        except Exception as e:
+            print(f"  Body tracking error: {e}")
+            use_body = False
+            bodies = []
+        for frame_num, body in zip(body_frames, bodies):
+            if body:
+                body_positions.append((frame_num, *body))
+        body_frames.clear()
+    
+    print(f"  Detecting {' + '.join(detectors)} in one pass...")
+    
+    try:
+        for frame_num, frame_rgb in reader:
+            samples += 1
+            face = None
+            run_detector = tracker is None or tracker.advance(frame_rgb, frame_num)
             
-            best_score = -1
-            best_center = None
+            if not run_detector:
+                # Tracked position between anchors (none while searching for a face)
+                if tracker.box is not None:
+                    x, y, w, h = tracker.box
+                    face_positions.append((
+                        frame_num, (x + w/2) * reader.scale_x, w * reader.scale_x,
+                        tracker.score * tracker.track_confidence
+                    ))
+            elif face_detector is not None:
+                detector_calls += 1
+                try:
+                    face = find_face(frame_rgb)
+                except Exception as e:
+                    print(f"  MediaPipe face detection error: {e}")
+                    face_detector = None
+                    tracker = None
+                if face:
+                    face_positions.append((frame_num, *face[:3]))
+                    face_locked = face_locked or face[2] >= FACE_MIN_CONFIDENCE
+                if tracker is not None:
+                    bbox = None
+                    if face:
+                        x, y, w, h = face[3]
+                        bbox = (x / reader.scale_x, y / reader.scale_y, w / reader.scale_x, h / reader.scale_y)
+                    tracker.anchor(frame_num, bbox, face[2] if face else 0.0)
             
-            for r in results:
-                boxes = r.boxes
-                for box in boxes:
-                    cls = int(box.cls[0])
-                    if cls != 0:  # Only persons
-                        continue
-                    
-                    coords = box.xyxy[0].tolist()
-                    x1, y1, x2, y2 = coords
-                    
-                    # Upper region priority
-                    center_y = (y1 + y2) / 2
-                    if center_y > height * 0.7:
-                        continue
-                    
-                    center_x = (x1 + x2) / 2
-                    area = (x2 - x1) * (y2 - y1)
-                    
-                    # Score: favor larger + more centered
-                    distance_from_center = abs(center_x - width/2)
-                    centrality_bias = (1.0 - distance_from_center / (width/2)) * area * 0.3
-                    score = area + centrality_bias
-                    
-                    if score > best_score:
-                        best_score = score
-                        best_center = center_x
+            if converge:
+                # Before the body-batch guard below: a locked face skips it
+                active = face_positions if face_locked or 'body' not in detectors else body_positions
+                center_estimate = converged_center([x for _, x, _, _ in active], tolerance_px, confidence)
+                if center_estimate is not None:
+                    body_frames.clear()
+                    break
             
-            if best_center:
-                confidence = min(1.0, best_score / 100000)
-                # Add placeholder face_width (0) to match MediaPipe format
-                frame_positions.append((frame_num, best_center, 0, confidence))
+            if face_locked:
+                # The clip will use the face result - queued body frames are moot
+                body_frames.clear()
+            if not use_body or face_locked or (tracked and frame_num % DETECTION_FRAME_INTERVAL):
+                continue
             
-            frame_num += 1
-        
-        cap.release()
-        
-        if len(frame_positions) > 0:
-            print(f"  Found {len(frame_positions)} body frames")
-            # No avg_face_width for body tracking
-            return {
-                'positions': frame_positions,
-                'method': 'body',
-                'confidence': sum(c for _, _, _, c in frame_positions) / len(frame_positions),
-                'avg_face_width': 0  # Placeholder
-            }
-        
-        return None
+            # YOLO expects BGR numpy input - convert straight into the batch buffer
+            if body_batch is None:
+                body_batch = np.empty((batch_size, *frame_rgb.shape), dtype=np.uint8)
+            cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR, dst=body_batch[len(body_frames)])
+            body_frames.append(frame_num)
+            if len(body_frames) == batch_size:
+                run_body_batch()
         
+        if body_frames and use_body:
+            run_body_batch()
+    finally:
+        reader.close()
+        # Hand the detectors back to the pool for the next clip
+        stack.close()
+    
+    if tracker is not None:
+        print(f"  Tracked mode: {detector_calls} face detector calls for {samples} samples, {tracker.shot_cuts.cuts} shot cuts")
+    
+    convergence = None
+    if converge:
+        convergence = {
+            'converged': center_estimate is not None,
+            'center_x': center_estimate,
+            'samples_used': samples,
+            'samples_total': len(reader.frames),
+            'tolerance_px': tolerance_px,
+            'confidence': confidence,
+        }
+        if center_estimate is not None:
+            print(f"  Crop center converged to X={center_estimate:.0f} (+-{tolerance_px}px) "
+                  f"after {samples}/{len(reader.frames)} samples")
+    
+    face_data = _summarize_positions(face_positions, 'mediapipe_face')
+    if face_data and convergence and (face_locked or 'body' not in detectors):
+        face_data['convergence'] = convergence
+    if face_data and roi_cuts is not None:
+        searches = roi_stats['roi_searches']
+        face_data['roi_stats'] = {
+            'roi_searches': searches,
+            'roi_misses': roi_stats['roi_misses'],
+            'full_searches': roi_stats['full_searches'],
+            'shot_cuts': roi_cuts.cuts,
+            'miss_rate': roi_stats['roi_misses'] / searches if searches else 0.0,
+            'avg_roi_area': roi_stats['roi_area_sum'] / searches if searches else 1.0,
+        }
+        print(f"  ROI mode: {searches} ROI searches, miss rate {face_data['roi_stats']['miss_rate']:.0%}, "
+              f"avg area {face_data['roi_stats']['avg_roi_area']:.0%} of frame")
+    if face_data and (face_locked or 'body' not in detectors):
+        print(f"  Found {len(face_positions)} face frames with bounding boxes")
+        return face_data
+    
+    body_data = _summarize_positions(body_positions, 'body')
+    if body_data and convergence:
+        body_data['convergence'] = convergence
+    if body_data:
+        print(f"  Found {len(body_positions)} body frames (profile view fallback)")
+        # No avg_face_width for body tracking
+        body_data['avg_face_width'] = 0
+        return body_data
+    
+    print("  No faces or bodies detected")
+    return None
+
+
+def detect_faces_mediapipe(video_path: str, width: int, height: int, start: float = None, end: float = None) -> Optional[dict]:
+    """
+    Detect faces using MediaPipe Face Detection - MUCH more accurate!
+    Returns dict with per-frame positions AND face widths for safety margins.
+    start/end (seconds) limit detection to a window of video_path.
+    """
+    return detect_subjects(video_path, width, height, start, end, detectors=('face',))
+
+
+def detect_body_positions(video_path: str, width: int, height: int, start: float = None, end: float = None) -> Optional[dict]:
+    """
+    Detect person body positions using YOLO as fallback when face detection fails.
+    Returns dict with per-frame positions for profile views.
+    start/end (seconds) limit detection to a window of video_path.
+    """
+    return detect_subjects(video_path, width, height, start, end, detectors=('body',))
+
+
+# Sharded detection: long clips are split into time ranges, each analysed by
+# a worker process with its own decoder and detector instances.
+# DETECTION_WORKERS=1 keeps detection in-process. It sizes the shared worker
+# pool and caps the worker count a request can ask for.
+DETECTION_WORKERS = max(1, min(int(os.environ.get("DETECTION_WORKERS", "1")), os.cpu_count() or 1))
+DETECTION_SHARD_MIN_SECONDS = 20.0
+
+_detection_pool = None
+_detection_pool_lock = threading.Lock()
+
+
+def clamp_detection_workers(workers: Optional[int]) -> int:
+    """Requested detection workers limited to 1..DETECTION_WORKERS."""
+    return max(1, min(workers or 1, DETECTION_WORKERS))
+
+
+def _init_detection_worker(threads: int):
+    # Split the cores between workers instead of every process grabbing all of
+    # them (cv2 is already imported here, so OMP_NUM_THREADS would come too late)
+    cv2.setNumThreads(threads)
+    detector_registry.warm_up()
+
+
+def _get_detection_pool() -> ProcessPoolExecutor:
+    """
+    Shared detection worker pool of DETECTION_WORKERS processes, created once.
+    Workers stay alive between clips, so their detectors load once per worker.
+    'spawn' because forking a process that already runs model threads is not
+    safe.
+    """
+    global _detection_pool
+    with _detection_pool_lock:
+        if _detection_pool is None:
+            threads = max(1, (os.cpu_count() or 1) // DETECTION_WORKERS)
+            _detection_pool = ProcessPoolExecutor(
+                max_workers=DETECTION_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_detection_worker,
+                initargs=(threads,)
+            )
+        return _detection_pool
+
+
+def plan_detection_shards(total_frames: int, fps: float, workers: int,
+                          min_seconds: float = DETECTION_SHARD_MIN_SECONDS) -> list:
+    """
+    Splits a clip into up to `workers` contiguous (first_frame, end_frame)
+    ranges of at least min_seconds. Boundaries sit on the
+    DETECTION_FRAME_INTERVAL grid so the merged samples match a single pass.
+    """
+    count = max(1, min(workers, int(total_frames / (fps * min_seconds))))
+    grid = DETECTION_FRAME_INTERVAL
+    size = math.ceil(total_frames / count / grid) * grid
+    return [(first, min(first + size, total_frames)) for first in range(0, total_frames, size)]
+
+
+def _merge_roi_stats(stats: list) -> dict:
+    merged = {key: sum(s[key] for s in stats) for key in ('roi_searches', 'roi_misses', 'full_searches', 'shot_cuts')}
+    searches = merged['roi_searches']
+    merged['miss_rate'] = merged['roi_misses'] / searches if searches else 0.0
+    merged['avg_roi_area'] = sum(s['avg_roi_area'] * s['roi_searches'] for s in stats) / searches if searches else 1.0
+    return merged
+
+
+def detect_subjects_sharded(video_path: str, width: int, height: int, fps: float, total_frames: int,
+                            start: float = None, end: float = None, mode: str = 'dense',
+                            workers: int = DETECTION_WORKERS) -> Optional[dict]:
+    """
+    detect_subjects over time shards in parallel worker processes; partial
+    position lists are re-based to clip frame numbers and merged.
+    
+    Like a single pass, the clip uses faces if any shard locked onto a face,
+    otherwise the body positions of all shards. 'converge' mode is
+    inherently sequential and clips too short to shard run in-process.
+    """
+    workers = clamp_detection_workers(workers)
+    shards = plan_detection_shards(total_frames, fps, workers)
+    if mode == 'converge' or len(shards) < 2:
+        return detect_subjects(video_path, width, height, start, end, mode=mode)
+    
+    print(f"  Sharded detection: {len(shards)} shards on {workers} worker processes")
+    clip_start = start or 0.0
+    pool = _get_detection_pool()
+    try:
+        futures = [
+            (first, pool.submit(detect_subjects, video_path, width, height,
+                                clip_start + first / fps, clip_start + last / fps, mode=mode))
+            for first, last in shards
+        ]
+        results = [(first, future.result()) for first, future in futures]
     except Exception as e:
-        print(f"  Body tracking error: {e}")
+        print(f"  Sharded detection failed ({e}) - detecting in-process")
+        return detect_subjects(video_path, width, height, start, end, mode=mode)
+    
+    found = [(first, data) for first, data in results if data]
+    faces = [(first, data) for first, data in found if data['method'] == 'mediapipe_face']
+    chosen = faces or found
+    if not chosen:
         return None
+    
+    positions = [(frame + first, x, w, c) for first, data in chosen for frame, x, w, c in data['positions']]
+    merged = _summarize_positions(positions, chosen[0][1]['method'])
+    if not faces:
+        merged['avg_face_width'] = 0
+    roi_stats = [data['roi_stats'] for _, data in chosen if 'roi_stats' in data]
+    if roi_stats:
+        merged['roi_stats'] = _merge_roi_stats(roi_stats)
+    print(f"  Merged {len(positions)} {merged['method']} positions from {len(chosen)} shards")
+    return merged
 
 
-
-def create_smooth_trajectory(positions: list, total_frames: int, fps: float) -> dict:
+def create_smooth_trajectory(positions: list, total_frames: int, fps: float) -> Optional[Trajectory]:
     """
     Create smooth position trajectory for entire video with interpolation.
-    Returns dict: {frame_num: x_position} for ALL frames.
+    Returns a Trajectory (x_position for ALL frames).
     """
     import numpy as np
     from scipy import interpolate
@@ -372,7 +1228,7 @@ def create_smooth_trajectory(positions: list, total_frames: int, fps: float) ->
         if len(unique_frames) < 2:
             # Not enough data, use single position
             single_pos = int(unique_positions[0])
-            return {i: single_pos for i in range(total_frames)}
+            return Trajectory.constant(single_pos, total_frames)
         
         # Cubic interpolation for smooth motion
         f_interp = interpolate.interp1d(
@@ -395,8 +1251,7 @@ def create_smooth_trajectory(positions: list, total_frames: int, fps: float) ->
         else:
             smoothed = interpolated
         
-        # Convert to dict
-        trajectory = {i: int(smoothed[i]) for i in range(total_frames)}
+        trajectory = Trajectory(smoothed)
         
         print(f"  Created smooth trajectory: {len(trajectory)} frames, window={window}")
         return trajectory
@@ -405,14 +1260,113 @@ def create_smooth_trajectory(positions: list, total_frames: int, fps: float) ->
         print(f"  Trajectory creation error: {e}, using fallback")
         # Fallback: use median position
         median_pos = int(np.median(x_positions))
-        return {i: median_pos for i in range(total_frames)}
+        return Trajectory.constant(median_pos, total_frames)
+
+
+# Identifies the detectors + scoring behind cached detections. Bump it when
+# models or scoring change so stale positions aren't reused.
+DETECTOR_VERSION = "blazeface-sr-f16.yolov8n.v1"
+
+
+def detector_version(mode: str) -> str:
+    """
+    Detection cache version for a mode: DETECTOR_VERSION plus every sampling
+    parameter the mode's positions depend on, read at call time.
+    """
+    version = f"{DETECTOR_VERSION}.s{DETECTION_FRAME_INTERVAL}.w{DETECTION_MAX_WIDTH}"
+    if mode == 'tracked':
+        version += f".t{TRACK_FRAME_INTERVAL}.a{TRACK_ANCHOR_INTERVAL}"
+    elif mode == 'roi':
+        version += f".p{ROI_PADDING:g}.m{ROI_MIN_SIZE}"
+    elif mode == 'adaptive':
+        version += f".ss{SHOT_SAMPLE_SECONDS:g}.sm{SHOT_MIN_SAMPLES}.{scene_index.SCENE_INDEX_VERSION}"
+    return version
+
+
+def detect_subjects_cached(video_path: str, width: int, height: int, fps: float, total_frames: int,
+                           start: float = None, end: float = None, mode: str = 'dense',
+                           workers: int = DETECTION_WORKERS) -> Optional[dict]:
+    """
+    detect_subjects backed by the on-disk detection cache (core.detection_cache):
+    positions already detected for this source content, detector version and
+    mode are reused, and only the uncovered parts of [start, end) are run
+    through the detectors. 'converge' mode stops early, so it is never cached.
+    """
+    workers = clamp_detection_workers(workers)
+    
+    def detect(window_start, window_end):
+        if workers > 1:
+            window_frames = int((window_end - window_start) * fps)
+            return detect_subjects_sharded(video_path, width, height, fps, window_frames,
+                                           window_start, window_end, mode, workers)
+        return detect_subjects(video_path, width, height, window_start, window_end, mode=mode)
+    
+    window_start = start or 0.0
+    window_end = end if end is not None else window_start + total_frames / fps
+    if mode == 'converge':
+        return detect(start, end)
+    
+    version = detector_version(mode)
+    try:
+        source_hash = detection_cache.source_content_hash(video_path)
+        rows, intervals, roi_stats = detection_cache.load_detections(source_hash, version, mode)
+    except OSError as e:
+        print(f"  Detection cache unavailable ({e})")
+        return detect(start, end)
+    
+    gaps = detection_cache.uncovered_intervals(intervals, window_start, window_end)
+    stats = detection_cache.detection_cache_stats
+    if not gaps:
+        stats['hits'] += 1
+    elif gaps == [(window_start, window_end)]:
+        stats['misses'] += 1
+    else:
+        stats['partial'] += 1
+    
+    computed = []
+    new_roi_stats = []
+    for gap_start, gap_end in gaps:
+        data = detect(gap_start, gap_end)
+        positions = data['positions'] if data else []
+        computed.append(detection_cache.rows_from_positions(
+            positions, data['method'] if data else 'body', gap_start, fps
+        ))
+        if data and 'roi_stats' in data:
+            new_roi_stats.append((gap_start, gap_end, data['roi_stats']))
+    
+    if gaps:
+        new_rows = {column: np.concatenate([part[column] for part in computed]) for column in detection_cache.COLUMNS}
+        try:
+            detection_cache.store_detections(source_hash, version, mode, new_rows, gaps, new_roi_stats)
+        except OSError as e:
+            print(f"  Could not update detection cache: {e}")
+        rows = {column: np.concatenate([rows[column], new_rows[column]]) for column in detection_cache.COLUMNS}
+    
+    computed_seconds = sum(b - a for a, b in gaps)
+    print(f"  Detection cache: {window_end - window_start - computed_seconds:.1f}s reused, {computed_seconds:.1f}s detected")
+    
+    positions, method = detection_cache.positions_in_window(rows, window_start, window_end, fps)
+    data = _summarize_positions(positions, method) if positions else None
+    if data and method == 'body':
+        data['avg_face_width'] = 0
+    # ROI stats of every run behind the window's positions - cached or fresh
+    window_roi_stats = detection_cache.roi_stats_in_window(roi_stats, window_start, window_end)
+    window_roi_stats += [stats for _, _, stats in new_roi_stats]
+    if data and window_roi_stats:
+        data['roi_stats'] = _merge_roi_stats(window_roi_stats)
+    return data
 
 
-def detect_visual_interest_x(video_path: str) -> Optional[dict]:
+def detect_visual_interest_x(video_path: str, start: float = None, end: float = None,
+                             mode: str = 'dense', workers: int = DETECTION_WORKERS) -> Optional[dict]:
     """
     FULL DYNAMIC DETECTION - returns per-frame position trajectory.
+    With start/end (seconds) only that window of video_path is analysed and
+    frame numbers are relative to start. mode: see DETECTION_MODES.
+    workers > 1 shards detection over worker processes (detect_subjects_sharded).
+    Detections are cached per source content (detect_subjects_cached).
     
-    Returns: {'trajectory': {frame_num: x_pos}, 'fps': fps, 'total_frames': n}
+    Returns: {'trajectory': Trajectory, 'fps': fps, 'total_frames': n}
     """
     cap = cv2.VideoCapture(video_path)
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
@@ -421,54 +1375,54 @@ def detect_visual_interest_x(video_path: str) -> Optional[dict]:
     fps = cap.get(cv2.CAP_PROP_FPS)
     cap.release()
     
-    print(f"Analyzing video: {width}x{height}, {total_frames} frames @ {fps:.2f}fps")
+    if end is not None:
+        total_frames = max(0, int((end - (start or 0)) * fps))
     
-    # STAGE 1: MediaPipe Face Detection (accurate bounding boxes)
-    print("Stage 1: MediaPipe face detection...")
-    detection_data = detect_faces_mediapipe(video_path, width, height)
+    print(f"Analyzing video: {width}x{height}, {total_frames} frames @ {fps:.2f}fps")
     
-    # STAGE 2: Body Tracking Fallback
-    if not detection_data or detection_data['confidence'] < 0.3:
-        print("Stage 2: Body tracking (low face confidence)...")
-        detection_data = detect_body_positions(video_path, width, height)
+    # MediaPipe face detection with lazy YOLO body fallback, one decode pass
+    print("Detecting subjects (face, body fallback)...")
+    detection_data = detect_subjects_cached(video_path, width, height, fps, total_frames, start, end, mode, workers)
     
     if not detection_data:
         print("No detections - using center crop")
         center_x = width // 2
         return {
-            'trajectory': {i: center_x for i in range(total_frames)},
+            'trajectory': Trajectory.constant(center_x, total_frames),
             'fps': fps,
             'total_frames': total_frames,
             'width': width,
             'height': height
         }
     
-    # Create smooth trajectory for ALL frames
+    # Create smooth trajectory for ALL frames - or, when the static crop
+    # center already converged, just hold it (nothing to interpolate)
     positions = detection_data['positions']
-    trajectory = create_smooth_trajectory(positions, total_frames, fps)
+    convergence = detection_data.get('convergence')
+    if convergence and convergence['converged']:
+        trajectory = Trajectory.constant(int(convergence['center_x']), total_frames)
+    else:
+        trajectory = create_smooth_trajectory(positions, total_frames, fps)
     
     if trajectory is None:
         print("Trajectory creation failed - using median")
         median_x = int(np.median([x for _, x, _, _ in positions]))
-        trajectory = {i: median_x for i in range(total_frames)}
+        trajectory = Trajectory.constant(median_x, total_frames)
     
     # NOTE: Anti-center bias REMOVED - it was causing faces to be shifted off-center
     # Now using raw detected face positions for accurate centering
     
     # Clamp trajectory to valid bounds (prevent out-of-bounds crop)
+    # Ensure crop center is at least target_width/2 from edges
     target_width = int(height * (9/16))
-    for f in trajectory:
-        # Ensure crop center is at least target_width/2 from edges
-        min_x = target_width // 2
-        max_x = width - (target_width // 2)
-        trajectory[f] = max(min_x, min(trajectory[f], max_x))
+    trajectory.clamp(target_width // 2, width - (target_width // 2))
     
     method = detection_data['method']
     confidence = detection_data['confidence']
     avg_face_width = detection_data.get('avg_face_width', 0)
     print(f"Trajectory created: {len(trajectory)} frames (method={method}, conf={confidence:.2f}, avg_face_width={avg_face_width:.0f})")
     
-    return {
+    result = {
         'trajectory': trajectory,
         'fps': fps,
         'total_frames': total_frames,
@@ -478,13 +1432,460 @@ def detect_visual_interest_x(video_path: str) -> Optional[dict]:
         'confidence': confidence,
         'avg_face_width': avg_face_width
     }
+    if 'roi_stats' in detection_data:
+        result['roi_stats'] = detection_data['roi_stats']
+    if convergence:
+        result['convergence'] = convergence
+    return result
+
+
+def parse_filter_chain(filter_chain: str) -> list:
+    """
+    Parses an FFmpeg filter chain string into [(name, params)]:
+    "eq=contrast=1.1:brightness=0.02" -> [('eq', {'contrast': 1.1, 'brightness': 0.02})]
+    """
+    filters = []
+    for filter_str in filter_chain.split(','):
+        filter_str = filter_str.strip()
+        if not filter_str:
+            continue
+        
+        filter_name, _, param_str = filter_str.partition('=')
+        params = {}
+        for param in param_str.split(':'):
+            if '=' in param:
+                key, value = param.split('=', 1)
+                # Convert to float if numeric
+                try:
+                    params[key] = float(value)
+                except ValueError:
+                    params[key] = value
+        filters.append((filter_name, params))
+    return filters
+
+
+# libx264 settings shared by every render path
+ENCODE_SETTINGS = {
+    'crf': 18,                     # High quality (18 = visually lossless)
+    'preset': 'slow',              # Better compression
+    'profile:v': 'high',           # H.264 High Profile
+    'pix_fmt': 'yuv420p',          # High Profile is 4:2:0 only (lut3d outputs RGB)
+    'b:a': '192k'                  # High quality audio (use b:a not audio_bitrate)
+}
+
+# Extra settings for files delivered to users
+FINAL_OUTPUT_SETTINGS = {
+    'movflags': '+faststart',      # Web optimization
+}
+
+
+# FILTER-GRAPH PLANNER
+# Estimated cost of a stage per pixel of the frame it writes (relative units;
+# crop only moves data pointers, timestamp/command filters touch no pixels)
+STAGE_COSTS = {
+    'crop': 0.0,
+    'setpts': 0.0,
+    'sendcmd': 0.0,
+    'scale': 4.0,   # bicubic: ~4 taps per output pixel
+    'eq': 1.0,      # per-plane lookup tables
+    'hue': 2.0,
+    'ass': 0.25,    # only glyph areas are blended
+    'lut3d': 5.0,   # tetrahedral lookup + the yuv<->rgb conversions it forces
+}
+DEFAULT_STAGE_COST = 1.0
+
+# eq parameters that act on the chroma planes - eq filters that both touch
+# chroma are kept separate, since their order then matters
+EQ_CHROMA_PARAMS = {'saturation', 'gamma_r', 'gamma_g', 'gamma_b'}
+# eq parameters at these values change nothing
+EQ_IDENTITY = {'contrast': 1.0, 'brightness': 0.0, 'saturation': 1.0, 'gamma': 1.0,
+               'gamma_r': 1.0, 'gamma_g': 1.0, 'gamma_b': 1.0, 'gamma_weight': 1.0}
 
 
-def auto_reframe(video_path: str, output_path: str, color_grading: str = 'none'):
+class FilterPlan:
+    """
+    An ordered video filter chain plus the frame size each stage outputs,
+    so plans can be compared by estimated pixel operations before rendering.
+    """
+    
+    def __init__(self, width: int, height: int):
+        self.stages = []
+        self.width = width
+        self.height = height
+    
+    def add(self, name: str, *args, out_size: tuple = None, **kwargs):
+        if out_size:
+            self.width, self.height = out_size
+        self.stages.append((name, args, kwargs, self.width, self.height))
+        return self
+    
+    @property
+    def cost(self) -> float:
+        """Estimated pixel operations per frame."""
+        return sum(STAGE_COSTS.get(name, DEFAULT_STAGE_COST) * width * height
+                   for name, _, _, width, height in self.stages)
+    
+    def apply(self, video):
+        for name, args, kwargs, _, _ in self.stages:
+            video = video.filter(name, *args, **kwargs)
+        return video
+    
+    def describe(self) -> str:
+        parts = []
+        for name, args, kwargs, _, _ in self.stages:
+            params = [str(a) for a in args] + [f"{k}={v}" for k, v in kwargs.items()]
+            parts.append(f"{name}={':'.join(params)}" if params else name)
+        return ','.join(parts)
+
+
+def plan_grading(color_grading: str) -> list:
+    """
+    A grading preset as the fewest equivalent filters: identity parameters
+    and empty filters are dropped, 'hue=s=0' becomes eq saturation=0, and
+    consecutive eq filters with disjoint parameters are merged into one.
+    """
+    planned = []
+    for name, params in parse_filter_chain(get_color_grading_filter(color_grading)):
+        if name == 'hue' and set(params) == {'s'}:
+            # Desaturation only: eq does it in the same pass as the luma tweaks
+            name, params = 'eq', {'saturation': params['s']}
+        if name == 'eq':
+            params = {k: v for k, v in params.items() if EQ_IDENTITY.get(k) != v}
+            if not params:
+                continue
+            if (planned and planned[-1][0] == 'eq' and not set(planned[-1][1]) & set(params)
+                    and not (set(planned[-1][1]) & EQ_CHROMA_PARAMS and set(params) & EQ_CHROMA_PARAMS)):
+                planned[-1] = ('eq', {**planned[-1][1], **params})
+                continue
+        planned.append((name, params))
+    return planned
+
+
+# Color grading backend: 'filters' renders the eq/hue chain, 'lut' always
+# renders presets as one baked 3D LUT (core.luts), 'auto' picks whichever
+# the planner estimates cheaper. Custom LUT presets always use lut3d.
+GRADING_BACKENDS = ('auto', 'filters', 'lut')
+GRADING_BACKEND = os.environ.get("GRADING_BACKEND", "auto")
+
+
+def resolve_grading_lut(color_grading: str, backend: str = GRADING_BACKEND) -> Optional[str]:
+    """
+    Returns the .cube file to grade with via lut3d, or None to render the
+    preset's filter chain. Built-in presets are baked (and cached) on demand.
+    """
+    if backend not in GRADING_BACKENDS:
+        raise ValueError(f"Unknown grading backend: {backend!r}")
+    if color_grading not in COLOR_GRADING_PRESETS:
+        return luts.custom_lut_path(color_grading)
+    
+    grading = plan_grading(color_grading)
+    if not grading or backend == 'filters':
+        return None
+    filters_cost = sum(STAGE_COSTS.get(name, DEFAULT_STAGE_COST) for name, _ in grading)
+    if backend == 'auto' and filters_cost <= STAGE_COSTS['lut3d']:
+        return None
+    try:
+        return luts.bake_lut(color_grading, parse_filter_chain(get_color_grading_filter(color_grading)))
+    except (ffmpeg.Error, OSError) as e:
+        print(f"LUT bake failed for '{color_grading}' ({e}) - using filters")
+        return None
+
+
+def bake_preset_luts() -> dict:
+    """Bakes every built-in preset into the LUT cache (e.g. at startup)."""
+    return {preset: resolve_grading_lut(preset, 'lut') for preset in COLOR_GRADING_PRESETS}
+
+
+def plan_reframe_graph(geometry: dict, color_grading: str = 'none', subtitles_path: str = None,
+                       time_offset: float = 0.0, optimize: bool = True) -> FilterPlan:
+    """
+    Builds the reframe filter chain for auto_reframe's crop geometry.
+    
+    optimize=True plans the cheapest equivalent chain: crop in source
+    coordinates BEFORE scaling (only the kept 9:16 window is scaled instead
+    of the whole upscaled frame), merged grading (plan_grading) and no
+    no-op stages. optimize=False is the original scale -> crop -> grading
+    chain, kept for comparison.
+    """
+    plan = FilterPlan(geometry['source_width'], geometry['source_height'])
+    target = (geometry['target_width'], geometry['target_height'])
+    dynamic = geometry.get('crop_commands')
+    
+    # Dynamic crop schedules and burned subtitles run on clip time - shift a
+    # chunk's timestamps to where it sits in the clip, and back afterwards
+    shift_time = time_offset and (subtitles_path or dynamic)
+    if shift_time:
+        plan.add('setpts', f'PTS-STARTPTS+{time_offset}/TB')
+    if dynamic:
+        # sendcmd swaps in each keyframe segment's crop x(t) expression
+        plan.add('sendcmd', filename=dynamic.replace("\\", "/"))
+    
+    if optimize and geometry['landscape']:
+        # Same window in source pixels, then scale just that window up
+        scale = geometry['scaled_height'] / geometry['source_height']
+        crop_width = min(geometry['source_width'], int(round(geometry['target_width'] / scale / 2)) * 2)
+        crop_height = min(geometry['source_height'], int(round(geometry['target_height'] / scale / 2)) * 2)
+        plan.add('crop', crop_width, crop_height, geometry['source_x'], int(geometry['y'] / scale),
+                 out_size=(crop_width, crop_height))
+        plan.add('scale', *target, out_size=target)
+    elif optimize:
+        if target != (plan.width, plan.height) or dynamic:
+            plan.add('crop', *target, geometry['x'], geometry['y'], out_size=target)
+    else:
+        if geometry['landscape']:
+            plan.add('scale', geometry['scaled_width'], geometry['scaled_height'],
+                     out_size=(geometry['scaled_width'], geometry['scaled_height']))
+        plan.add('crop', *target, geometry['x'], geometry['y'], out_size=target)
+    
+    if geometry.get('lut_path'):
+        # Whole grading preset in one pass, however many filters it has
+        plan.add('lut3d', file=geometry['lut_path'].replace("\\", "/"), interp='tetrahedral')
+    else:
+        grading = plan_grading(color_grading) if optimize else parse_filter_chain(get_color_grading_filter(color_grading))
+        for name, params in grading:
+            plan.add(name, **params)
+    
+    # Fused render: burn subtitles in the same graph, so the clip is
+    # encoded once instead of once here and again for the 'ass' pass
+    if subtitles_path:
+        plan.add('ass', subtitles_path.replace("\\", "/"))
+    if shift_time:
+        plan.add('setpts', 'PTS-STARTPTS')
+    return plan
+
+
+def build_reframe_filters(video, geometry: dict, color_grading: str = 'none', subtitles_path: str = None,
+                          time_offset: float = 0.0):
+    """
+    Applies the planned Crop/Scale → Color Grading → Subtitles chain
+    (plan_reframe_graph) to an ffmpeg-python video stream.
+    time_offset: clip time (seconds) of the stream's first frame, so burned
+    subtitles and dynamic crops stay in sync when rendering a chunk from
+    the middle of a clip.
+    """
+    plan = plan_reframe_graph(geometry, color_grading, subtitles_path, time_offset, geometry.get('optimize', True))
+    print(f"Filter plan: {plan.describe()} (~{plan.cost / 1e6:.1f}M pixel-ops/frame)")
+    return plan.apply(video)
+
+
+# DYNAMIC CROP
+# The smoothed trajectory is simplified to a piecewise-linear keyframe
+# schedule and rendered by ffmpeg itself: a sendcmd file gives crop a new
+# x = a + b*t expression at every keyframe. No per-frame Python, no raw frames.
+CROP_MODES = ('static', 'dynamic')
+DYNAMIC_CROP_TOLERANCE_PX = 3.0  # max deviation (output px) from the smoothed trajectory
+
+
+def simplify_polyline(values, tolerance: float) -> list:
+    """
+    Ramer-Douglas-Peucker on a uniformly sampled series: indices of the
+    points to keep so linear interpolation between them stays within
+    `tolerance` of every value.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < 3:
+        return list(range(len(values)))
+    keep = {0, len(values) - 1}
+    stack = [(0, len(values) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        segment = values[first:last + 1]
+        line = np.linspace(values[first], values[last], len(segment))
+        split = int(np.argmax(np.abs(segment - line)))
+        if abs(segment[split] - line[split]) > tolerance:
+            keep.add(first + split)
+            stack.append((first, first + split))
+            stack.append((first + split, last))
+    return sorted(keep)
+
+
+def compile_crop_schedule(crop_x, fps: float, tolerance: float = DYNAMIC_CROP_TOLERANCE_PX) -> list:
+    """
+    Per-frame crop x positions -> [(time, x, slope)] keyframe segments:
+    from `time` on, x(t) = x + slope * (t - time).
+    """
+    crop_x = np.asarray(crop_x, dtype=np.float64)
+    keyframes = simplify_polyline(crop_x, tolerance)
+    schedule = []
+    for first, last in zip(keyframes, keyframes[1:] + [None]):
+        if last is None:
+            slope = 0.0
+        else:
+            slope = (crop_x[last] - crop_x[first]) / ((last - first) / fps)
+        schedule.append((first / fps, float(crop_x[first]), slope))
+    return schedule
+
+
+def write_crop_commands(schedule: list, path: str) -> str:
+    """Writes a crop schedule as an ffmpeg sendcmd file targeting crop's x."""
+    with open(path, "w", encoding="utf-8") as f:
+        for time, x, slope in schedule:
+            # No spaces or commas: sendcmd splits commands on ',' and ';'
+            f.write(f"{time:.4f} crop x {x:.2f}{slope:+.4f}*(t-{time:.4f});\n")
+    return path
+
+
+# CHUNKED ENCODING
+# Long clips are split at planned GOP boundaries and the chunks are encoded by
+# parallel libx264 processes, then joined with a lossless concat (stream copy).
+# Chunk size in seconds; None disables chunking unless a caller asks for it.
+CHUNKED_ENCODE_SECONDS = None
+CHUNKED_ENCODE_WORKERS = max(1, (os.cpu_count() or 1) // 4)
+GOP_SECONDS = 2.0
+
+
+def plan_encode_chunks(duration: float, fps: float, chunk_seconds: float) -> list:
+    """
+    Splits a clip into (first_frame, frame_count) chunks whose boundaries fall
+    on GOP boundaries (chunk length is a whole number of GOPs).
+    """
+    gop = max(1, round(fps * GOP_SECONDS))
+    total_frames = int(round(duration * fps))
+    chunk_frames = max(gop, int(round(chunk_seconds * fps / gop)) * gop)
+    return [
+        (first, min(chunk_frames, total_frames - first))
+        for first in range(0, total_frames, chunk_frames)
+    ]
+
+
+def encode_chunked(video_path: str, output_path: str, build_video, fps: float, duration: float,
+                   start: float = None, chunk_seconds: float = 30.0, workers: int = None,
+                   final_output: bool = False):
+    """
+    Encodes a clip as parallel GOP-aligned chunks and joins them losslessly.
+    
+    build_video(video_stream, time_offset) must apply the clip's filter graph.
+    Every chunk uses identical encoder settings with a fixed GOP (no scene-cut
+    keyframes), so the concat demuxer can join them with stream copy into one
+    valid H.264 stream. Audio is encoded once, in parallel with the chunks.
+    
+    Every chunk seeks exactly like a single-pass render and selects its
+    frames by index (trim on frame numbers), so chunk frame n is always
+    single-pass frame first_frame + n - no boundary frame is repeated or
+    dropped. The frames before a chunk are only decoded, which is cheap next
+    to encoding them. Assumes constant frame rate sources (frame n at n/fps).
+    """
+    workers = workers or CHUNKED_ENCODE_WORKERS
+    chunks = plan_encode_chunks(duration, fps, chunk_seconds)
+    gop = max(1, round(fps * GOP_SECONDS))
+    threads_per_chunk = max(1, (os.cpu_count() or 1) // workers)
+    
+    chunk_dir = output_path + ".chunks"
+    os.makedirs(chunk_dir, exist_ok=True)
+    print(f"Chunked encode: {len(chunks)} chunks of <= {chunks[0][1]} frames, {workers} workers x {threads_per_chunk} threads")
+    
+    video_settings = {k: v for k, v in ENCODE_SETTINGS.items() if k != 'b:a'}
+    
+    def encode_chunk(index: int, first_frame: int, frame_count: int) -> str:
+        chunk_path = os.path.join(chunk_dir, f"chunk_{index:04d}.mp4")
+        input_stream = ffmpeg.input(video_path, ss=start) if start else ffmpeg.input(video_path)
+        video = (
+            input_stream.video
+            .trim(start_frame=first_frame, end_frame=first_frame + frame_count)
+            .setpts('PTS-STARTPTS')
+        )
+        video = build_video(video, first_frame / fps)
+        (
+            ffmpeg
+            .output(
+                video, chunk_path,
+                vcodec='libx264',
+                **video_settings,
+                **{
+                    'frames:v': frame_count,
+                    'g': gop,                  # Fixed GOP so chunk starts are GOP starts
+                    'keyint_min': gop,
+                    'sc_threshold': 0,
+                    'threads': threads_per_chunk,
+                    'vsync': 0,                # Passthrough - never duplicate or drop frames
+                }
+            )
+            .overwrite_output()
+            .run(capture_stdout=True, capture_stderr=True)
+        )
+        return chunk_path
+    
+    def encode_audio() -> str:
+        audio_path = os.path.join(chunk_dir, "audio.m4a")
+        input_args = {'ss': start} if start else {}
+        (
+            ffmpeg
+            .input(video_path, **input_args)
+            .output(audio_path, t=duration, vn=None, acodec='aac', **{'b:a': ENCODE_SETTINGS['b:a']})
+            .overwrite_output()
+            .run(capture_stdout=True, capture_stderr=True)
+        )
+        return audio_path
+    
+    try:
+        # Each job is an ffmpeg process; threads only supervise them
+        with ThreadPoolExecutor(max_workers=workers + 1) as pool:
+            audio_future = pool.submit(encode_audio)
+            chunk_futures = [pool.submit(encode_chunk, i, first, count) for i, (first, count) in enumerate(chunks)]
+            chunk_paths = [future.result() for future in chunk_futures]
+            audio_path = audio_future.result()
+        
+        list_path = os.path.join(chunk_dir, "chunks.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            for chunk_path, (_, frame_count) in zip(chunk_paths, chunks):
+                f.write(f"file '{os.path.abspath(chunk_path)}'\n")
+                # Explicit length: with B-frames a chunk's first DTS is negative and
+                # the demuxer would start the next chunk one frame early
+                f.write(f"duration {frame_count / fps}\n")
+        
+        mux_settings = {'movflags': FINAL_OUTPUT_SETTINGS['movflags']} if final_output else {}
+        (
+            ffmpeg
+            .output(
+                ffmpeg.input(list_path, f='concat', safe=0).video,
+                ffmpeg.input(audio_path).audio,
+                output_path,
+                c='copy',
+                **mux_settings
+            )
+            .overwrite_output()
+            .run(capture_stdout=True, capture_stderr=True)
+        )
+    except ffmpeg.Error as e:
+        print(f"FFmpeg Error: {e.stderr.decode('utf-8')}")
+        raise
+    finally:
+        shutil.rmtree(chunk_dir, ignore_errors=True)
+
+
+def auto_reframe(video_path: str, output_path: str, color_grading: str = 'none', subtitles_path: str = None,
+                 start: float = None, end: float = None, chunk_seconds: float = CHUNKED_ENCODE_SECONDS,
+                 detection_mode: str = 'dense', detection_workers: int = DETECTION_WORKERS,
+                 crop_mode: str = 'static', optimize_filters: bool = True,
+                 grading_backend: str = GRADING_BACKEND):
     """
     Reframes video to 9:16 using STATIC CENTERED FACE CROP.
     Applies color grading preset for professional look.
+    
+    If subtitles_path (ASS) is given, subtitles are burned in the same filter
+    graph (scale -> crop -> grading -> ass) and output_path is the final,
+    web-ready file - one encode per clip instead of two.
+    
+    start/end (seconds) render just that window of video_path, seeking
+    straight into the source (accurate input seeking) instead of needing a
+    pre-cut intermediate file.
+    
+    chunk_seconds: if set and the clip is longer than 1.5 chunks, encode it as
+    parallel GOP-aligned chunks (see encode_chunked).
+    
+    detection_mode: face detection strategy, see DETECTION_MODES.
+    detection_workers: worker processes for sharded detection (1 = in-process).
+    crop_mode: 'static' (one crop for the clip) or 'dynamic' (follows the
+    trajectory via a keyframe schedule, see compile_crop_schedule).
+    optimize_filters: render the cheapest equivalent filter chain
+    (plan_reframe_graph); False keeps the original scale -> crop chain.
+    grading_backend: see GRADING_BACKENDS. color_grading may also name a
+    registered custom LUT preset.
     """
+    if crop_mode not in CROP_MODES:
+        raise ValueError(f"Unknown crop mode: {crop_mode!r}")
     try:
         # Get video info
         probe = ffmpeg.probe(video_path)
@@ -524,7 +1925,7 @@ def auto_reframe(video_path: str, output_path: str, color_grading: str = 'none')
         # STATIC CENTERED FACE CROP (no dynamic movement)
         print("Detecting face for centered stable crop...")
         # Note: Face detection runs on ORIGINAL video dimensions
-        tracking_data = detect_visual_interest_x(video_path)
+        tracking_data = detect_visual_interest_x(video_path, start, end, mode=detection_mode, workers=detection_workers)
         
         if not tracking_data or 'trajectory' not in tracking_data:
             print("Face detection failed - using center crop")
@@ -538,20 +1939,9 @@ def auto_reframe(video_path: str, output_path: str, color_grading: str = 'none')
             trajectory = tracking_data['trajectory']
             avg_face_width = tracking_data.get('avg_face_width', 0)
             
-            # Calculate WEIGHTED AVERAGE position (weighted by confidence for accuracy)
-            # This gives more weight to high-confidence detections
-            all_positions = list(trajectory.values())
-            
-            # Use weighted median - middle 60% of positions (ignore outliers)
-            sorted_positions = sorted(all_positions)
-            trim_count = int(len(sorted_positions) * 0.2)  # Trim 20% from each end
-            if trim_count > 0 and len(sorted_positions) > trim_count * 2:
-                trimmed = sorted_positions[trim_count:-trim_count]
-            else:
-                trimmed = sorted_positions
-            
-            # Use mean of trimmed positions for smoother centering
-            face_center_x = int(sum(trimmed) / len(trimmed))
+            # Use mean of the middle 60% of positions (trim 20% from each end -
+            # ignores outliers) for smoother centering
+            face_center_x = int(trajectory.trimmed_mean(0.2))
             
             # For landscape sources with scaling, scale the face position too
             if source_aspect > 1:
@@ -559,7 +1949,7 @@ def auto_reframe(video_path: str, output_path: str, color_grading: str = 'none')
                 print(f"Face detected at X={face_center_x} (original), scaled to X={face_center_x_scaled}")
             else:
                 face_center_x_scaled = face_center_x
-                print(f"Face detected at weighted center X={face_center_x} (from {len(trimmed)} samples)")
+                print(f"Face detected at weighted center X={face_center_x} (from {len(trajectory)} frames)")
             
             print(f"  Target crop: {target_width}x{target_height}")
             print(f"  Face avg width: {avg_face_width:.0f}px")
@@ -598,72 +1988,91 @@ def auto_reframe(video_path: str, output_path: str, color_grading: str = 'none')
             offset = actual_face_in_crop - half_crop
             print(f"STATIC crop: X={x}, face at {face_center_x_scaled}, in-crop position: {actual_face_in_crop}/{target_width} (offset: {offset:+d}px)")
         
-        # Apply filters: Scale (if needed) → Crop → Color Grading
-        input_stream = ffmpeg.input(video_path)
-        audio = input_stream.audio
-        video = input_stream.video
-        
-        # For landscape sources, scale first before cropping
-        if source_aspect > 1:
-            print(f"Applying scale: {scaled_width}x{scaled_height}")
-            video = video.filter('scale', scaled_width, scaled_height)
-        
-        # Apply crop (on scaled video if landscape, original if portrait)
-        print(f"Applying crop: {target_width}x{target_height} at ({x}, {y})")
-        video = video.filter('crop', target_width, target_height, x, y)
-        
-        # Apply color grading if specified
-        grading_filter = get_color_grading_filter(color_grading)
-        if grading_filter:
-            print(f"Applying color grading: {color_grading}")
-            # Apply each filter in the chain
-            for filter_str in grading_filter.split(','):
-                filter_str = filter_str.strip()
-                if not filter_str:
-                    continue
-                
-                # Parse filter: "eq=contrast=1.1:brightness=0.02" -> filter('eq', contrast=1.1, brightness=0.02)
-                if '=' in filter_str:
-                    parts = filter_str.split('=', 1)
-                    filter_name = parts[0]
-                    
-                    # Parse parameters
-                    params = {}
-                    if len(parts) > 1 and parts[1]:
-                        param_str = parts[1]
-                        for param in param_str.split(':'):
-                            if '=' in param:
-                                key, value = param.split('=', 1)
-                                # Convert to float if numeric
-                                try:
-                                    params[key] = float(value)
-                                except ValueError:
-                                    params[key] = value
-                    
-                    video = video.filter(filter_name, **params)
-                else:
-                    # Simple filter without parameters
-                    video = video.filter(filter_str)
-        
-        # High-quality encoding
-        (
-            ffmpeg
-            .output(
-                video, audio, output_path,
-                vcodec='libx264',
-                acodec='aac',
-                **{
-                    'crf': 18,
-                    'preset': 'slow',
-                    'profile:v': 'high',
-                    'b:a': '192k'
-                }
-            )
-            .overwrite_output()
-            .run(quiet=False)
-        )
+        geometry = {
+            'landscape': source_aspect > 1,
+            'scaled_width': scaled_width,
+            'scaled_height': scaled_height,
+            'target_width': target_width,
+            'target_height': target_height,
+            'x': x,
+            'y': y,
+            'source_width': width,
+            'source_height': height,
+            # Crop x in source pixels, for plans that crop before scaling
+            'source_x': int(round(x / scale_factor)) if source_aspect > 1 else x,
+            'optimize': optimize_filters,
+            'lut_path': resolve_grading_lut(color_grading, grading_backend),
+        }
         
-        print(f"Reframing complete: {output_path}")
+        if crop_mode == 'dynamic' and tracking_data and 'trajectory' in tracking_data:
+            # Trajectory holds crop CENTERS in source pixels -> crop x in the
+            # (scaled) frame, clamped like the static crop
+            scale = scale_factor if source_aspect > 1 else 1.0
+            max_x = (scaled_width if source_aspect > 1 else width) - target_width
+            crop_x = np.clip(tracking_data['trajectory'].positions * scale - target_width // 2, 0, max_x)
+            if optimize_filters and source_aspect > 1:
+                # The optimized plan crops before scaling - schedule in source pixels
+                schedule = compile_crop_schedule(crop_x / scale, fps, DYNAMIC_CROP_TOLERANCE_PX / scale)
+                geometry['source_x'] = int(schedule[0][1])
+            else:
+                schedule = compile_crop_schedule(crop_x, fps)
+                geometry['x'] = geometry['source_x'] = int(schedule[0][1])
+            geometry['crop_commands'] = write_crop_commands(schedule, output_path + ".crop.cmd")
+            print(f"Dynamic crop: {len(crop_x)} frames -> {len(schedule)} keyframes")
+        
+        try:
+            encode_reframed(video_path, output_path, geometry, color_grading, subtitles_path,
+                            fps, probe, start, end, chunk_seconds)
+        finally:
+            if geometry.get('crop_commands') and os.path.exists(geometry['crop_commands']):
+                os.remove(geometry['crop_commands'])
     except Exception as e:
         print(f"Reframing error: {e}")
         raise
+
+
+def encode_reframed(video_path: str, output_path: str, geometry: dict, color_grading: str,
+                    subtitles_path: Optional[str], fps: float, probe: dict,
+                    start: float = None, end: float = None, chunk_seconds: float = None):
+    """Renders a clip with the crop geometry from auto_reframe - single pass or chunked."""
+    # Long clips: encode GOP-aligned chunks in parallel and join them
+    clip_duration = (end if end is not None else float(probe['format']['duration'])) - (start or 0)
+    if chunk_seconds and clip_duration > chunk_seconds * 1.5:
+        encode_chunked(
+            video_path, output_path,
+            lambda video, time_offset: build_reframe_filters(video, geometry, color_grading, subtitles_path, time_offset),
+            fps, clip_duration, start=start, chunk_seconds=chunk_seconds,
+            final_output=bool(subtitles_path)
+        )
+        print(f"Reframing complete: {output_path}")
+        return
+    
+    # -ss/-to as INPUT options: fast keyframe seek, then frame-accurate
+    # decode up to start (we re-encode, so no keyframe drift)
+    input_args = {}
+    if start is not None:
+        input_args['ss'] = start
+    if end is not None:
+        input_args['to'] = end
+    input_stream = ffmpeg.input(video_path, **input_args)
+    audio = input_stream.audio
+    video = build_reframe_filters(input_stream.video, geometry, color_grading, subtitles_path)
+    
+    output_settings = dict(ENCODE_SETTINGS)
+    if subtitles_path:
+        output_settings.update(FINAL_OUTPUT_SETTINGS)
+    
+    # High-quality encoding
+    (
+        ffmpeg
+        .output(
+            video, audio, output_path,
+            vcodec='libx264',
+            acodec='aac',
+            **output_settings
+        )
+        .overwrite_output()
+        .run(quiet=False)
+    )
+    
+    print(f"Reframing complete: {output_path}")
@@ -0,0 +1,103 @@
+"""
+Shot-boundary index per source video.
+
+Cuts are found with ffmpeg's scdet filter on a low-res pass and cached next
+to the detection cache, keyed by source content hash. Like detections, the
+index records which source intervals were scanned, so each part of a source
+is scanned at most once no matter how many clips use it.
+"""
+import os
+import re
+import json
+import threading
+
+import ffmpeg
+
+from core import detection_cache
+
+# scdet scene score (0-100) above which a frame starts a new shot
+SCENE_CUT_THRESHOLD = 10.0
+# Width of the scan pass - shot changes survive heavy downscaling
+SCENE_INDEX_WIDTH = 160
+# Index entries are invalidated when the scan settings change
+SCENE_INDEX_VERSION = f"scdet{SCENE_CUT_THRESHOLD:g}.w{SCENE_INDEX_WIDTH}"
+
+_SCDET_TIME_RE = re.compile(r"lavfi\.scd\.time:\s*([0-9.]+)")
+_scene_index_lock = threading.Lock()
+
+
+def _index_path(source_hash: str) -> str:
+    return os.path.join(detection_cache.DETECTION_CACHE_DIR, f"{source_hash}_scenes_{SCENE_INDEX_VERSION}.json")
+
+
+def _load_index(source_hash: str) -> dict:
+    path = _index_path(source_hash)
+    if os.path.exists(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            detection_cache.touch_entry(path)
+            return {"cuts": index.get("cuts", []), "intervals": [tuple(i) for i in index.get("intervals", [])]}
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Scene index unreadable ({e}), rescanning")
+    return {"cuts": [], "intervals": []}
+
+
+def _save_index(source_hash: str, index: dict):
+    os.makedirs(detection_cache.DETECTION_CACHE_DIR, exist_ok=True)
+    path = _index_path(source_hash)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(tmp_path, path)
+    # Indexes share the detection cache directory and its size bound
+    detection_cache.evict_entries(keep=path)
+
+
+def scan_scene_cuts(video_path: str, start: float = None, end: float = None) -> list:
+    """
+    Runs one low-res scdet pass over [start, end) of video_path.
+    Returns the source times (seconds) where new shots begin.
+    """
+    input_args = {}
+    if start:
+        input_args['ss'] = start
+    if end is not None:
+        input_args['to'] = end
+    _, stderr = (
+        ffmpeg
+        .input(video_path, **input_args)
+        .video
+        .filter('scale', SCENE_INDEX_WIDTH, -2)
+        .filter('scdet', threshold=SCENE_CUT_THRESHOLD)
+        .output('-', format='null')
+        .global_args('-nostdin')
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+    # Input seeking restarts timestamps at 0 - shift back to source time
+    return [(start or 0.0) + float(t) for t in _SCDET_TIME_RE.findall(stderr.decode('utf-8', 'replace'))]
+
+
+def scene_cuts(video_path: str, start: float, end: float) -> list:
+    """
+    Shot boundaries (source seconds) inside [start, end), scanning only the
+    parts of the window the cached index doesn't cover yet.
+    """
+    source_hash = detection_cache.source_content_hash(video_path)
+    with _scene_index_lock:
+        index = _load_index(source_hash)
+    gaps = detection_cache.uncovered_intervals(index["intervals"], start, end)
+
+    if gaps:
+        scanned = []
+        for gap_start, gap_end in gaps:
+            scanned.extend(scan_scene_cuts(video_path, gap_start, gap_end))
+        with _scene_index_lock:
+            # Re-read so concurrent clips of the same source don't drop each other's scans
+            index = _load_index(source_hash)
+            index["cuts"] = sorted(set(index["cuts"]) | set(scanned))
+            index["intervals"] = detection_cache.merge_intervals(index["intervals"] + gaps)
+            _save_index(source_hash, index)
+        print(f"  Scene index: scanned {sum(b - a for a, b in gaps):.1f}s, {len(scanned)} cuts")
+
+    return [t for t in index["cuts"] if start <= t < end]
@@ -0,0 +1,28 @@
+def parse_timestamp(value) -> float:
+    """
+    Converts a clip timestamp to seconds.
+    Accepts numbers, "SS(.ms)", "MM:SS(.ms)" or "HH:MM:SS(.ms)" strings.
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    parts = str(value).strip().split(':')
+    if len(parts) > 3:
+        raise ValueError(f"Invalid timestamp: {value!r}")
+
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def segment_bounds(segment) -> tuple:
+    """
+    Returns (start, end) in seconds for a ClipSegment-like object
+    (anything with start_time/end_time) or a (start, end) pair.
+    """
+    if hasattr(segment, 'start_time'):
+        start, end = segment.start_time, segment.end_time
+    else:
+        start, end = segment
+    return parse_timestamp(start), parse_timestamp(end)
@@ -0,0 +1,69 @@
+from collections.abc import Mapping
+
+import numpy as np
+
+
+def trimmed_mean(values, trim: float = 0.2) -> float:
+    """
+    Mean of values without the lowest and highest `trim` fraction.
+    Falls back to the plain mean when too few values are left.
+    """
+    values = np.sort(np.asarray(values, dtype=np.float64))
+    trim_count = int(len(values) * trim)
+    if trim_count > 0 and len(values) > trim_count * 2:
+        values = values[trim_count:-trim_count]
+    return float(values.mean())
+
+
+class Trajectory(Mapping):
+    """
+    Per-frame crop center X positions of a clip, stored as one int32 array
+    (4 bytes/frame instead of a dict entry per frame).
+
+    Reads like the old {frame_num: x} dict - trajectory[f], len(), keys(),
+    values(), items(), 'in' - so dict-style callers keep working, while
+    clamp(), trimmed_mean() and slicing run vectorized on the array.
+    """
+
+    def __init__(self, positions):
+        self.positions = np.asarray(positions).astype(np.int32, copy=False)
+
+    @classmethod
+    def constant(cls, x: int, total_frames: int) -> 'Trajectory':
+        return cls(np.full(total_frames, x, dtype=np.int32))
+
+    def __getitem__(self, frame):
+        if isinstance(frame, slice):
+            return Trajectory(self.positions[frame])
+        if not 0 <= frame < len(self.positions):
+            raise KeyError(frame)
+        return int(self.positions[frame])
+
+    def __setitem__(self, frame, x):
+        self.positions[frame] = x
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def __iter__(self):
+        return iter(range(len(self.positions)))
+
+    def __contains__(self, frame) -> bool:
+        return isinstance(frame, (int, np.integer)) and 0 <= frame < len(self.positions)
+
+    def __repr__(self) -> str:
+        return f"Trajectory({len(self)} frames)"
+
+    def clamp(self, min_x: int, max_x: int) -> 'Trajectory':
+        """Clamps every position to [min_x, max_x] in place."""
+        np.clip(self.positions, min_x, max_x, out=self.positions)
+        return self
+
+    def trimmed_mean(self, trim: float = 0.2) -> float:
+        return trimmed_mean(self.positions, trim)
+
+    def median(self) -> float:
+        return float(np.median(self.positions))
+
+    def to_dict(self) -> dict:
+        return dict(enumerate(self.positions.tolist()))
@@ -1,6 +1,8 @@
 import whisper
 import os
 import datetime
+import ffmpeg
+import numpy as np
 
 def format_timestamp(seconds: float):
     """Converts seconds to HH:MM:SS.mm format for ASS."""
@@ -13,17 +15,43 @@ def format_timestamp(seconds: float):
     millis = int(td.microseconds / 10000) # ASS uses centiseconds (2 digits)
     return f"{hours}:{minutes:02d}:{secs:02d}.{millis:02d}"
 
-def generate_dynamic_subtitles(video_path: str, model_size: str = "small"):
+def load_audio_window(video_path: str, start: float = None, end: float = None, sr: int = whisper.audio.SAMPLE_RATE):
+    """
+    Decodes [start, end] of the audio track to mono float32 at `sr`, the
+    format Whisper expects. Reads straight from the source - no cut file.
+    """
+    input_args = {}
+    if start is not None:
+        input_args['ss'] = start
+    if end is not None:
+        input_args['to'] = end
+    out, _ = (
+        ffmpeg
+        .input(video_path, **input_args)
+        .output('-', format='s16le', acodec='pcm_s16le', ac=1, ar=sr)
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+def generate_dynamic_subtitles(video_path: str, model_size: str = "small", start: float = None, end: float = None,
+                               ass_path: str = None):
     """
     Transcribes video using Whisper and generates an ASS file with word-level highlighting (Karaoke).
-    Returns the path to the ASS file.
+    With start/end (seconds) only that window of video_path is transcribed and
+    subtitle times are relative to start.
+    Returns the path to the ASS file (ass_path, or next to the video by default).
     """
     # Force CPU to use FP32 if needed, or suppress warning.
     # Changing model to 'small' for better accuracy than 'base'.
     model = whisper.load_model(model_size)
-    result = model.transcribe(video_path, word_timestamps=True)
+    if start is None and end is None:
+        audio = video_path
+    else:
+        audio = load_audio_window(video_path, start, end)
+    result = model.transcribe(audio, word_timestamps=True)
     
-    ass_path = os.path.splitext(video_path)[0] + ".ass"
+    if ass_path is None:
+        ass_path = os.path.splitext(video_path)[0] + ".ass"
     
     # ASS Header
     # ASS Header
@@ -1,14 +1,24 @@
-from fastapi import FastAPI, BackgroundTasks, HTTPException
+from fastapi import FastAPI, BackgroundTasks, HTTPException, UploadFile, File, Form
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from typing import Optional
 import os
 import uuid
 import shutil
+import threading
 import ffmpeg
-from core.downloader import download_youtube_video
-from core.processing import extract_highlight, auto_reframe
+from core.downloader import (
+    download_youtube_video, lookup_cached_source, release_cached_source,
+    get_source_cache_stats, describe_source, DownloadProgress
+)
+from core.processing import (
+    extract_highlight, extract_highlights, auto_reframe, source_seeks_well, detector_registry, DETECTION_WORKERS,
+    COLOR_GRADING_PRESETS, GRADING_BACKEND, bake_preset_luts
+)
+from core import luts
+from core.detection_cache import detection_cache_stats
 from core.transcription import generate_dynamic_subtitles
+from core.timecode import segment_bounds
 
 app = FastAPI(title="AI Video Shorts Generator API")
 
@@ -20,6 +30,18 @@ os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 app.mount("/output", StaticFiles(directory=OUTPUT_DIR), name="output")
 
+@app.on_event("startup")
+def warm_up_detectors():
+    # Load + warm the detection models once per worker, off the startup path,
+    # so the first clip doesn't pay for model init (or the model download)
+    threading.Thread(target=detector_registry.warm_up, daemon=True).start()
+    if GRADING_BACKEND == "lut":
+        threading.Thread(target=bake_preset_luts, daemon=True).start()
+
+@app.on_event("shutdown")
+def close_detectors():
+    detector_registry.close()
+
 # In-memory storage for project status (in a real app, use a database)
 project_status = {}
 
@@ -35,104 +57,322 @@ class ProcessRequest(BaseModel):
     project_name: str = "Untitled"
     resolution: str = "1080p" # Default to High Quality
     cookies_file: Optional[str] = None # Optional: Path to YouTube cookies file
-    color_grading: str = "none" # Color grading preset
+    color_grading: str = "none" # Color grading preset or registered custom LUT name
+    range_download: bool = False # Download only the segment ranges instead of the full video
+    format_policy: str = "prefer_avc1" # Source format ranking: 'prefer_avc1', 'balanced' or 'quality'
+    streaming: bool = False # Start clips while the (range) download is still running
+    fused_render: bool = True # Reframe, grade and burn subtitles in a single encode
+    seek_mode: str = "auto" # 'direct' (seek into source), 'cut' (intermediate file) or 'auto'
+    chunk_seconds: Optional[float] = None # Encode long clips as parallel chunks of this length
+    detection_mode: str = "dense" # 'dense', 'tracked' (anchors + optical flow), 'roi' (window around last face), 'converge' (early exit) or 'adaptive' (per shot)
+    detection_workers: int = DETECTION_WORKERS # Processes for sharded face/body detection (1 = in-process, capped at the server's DETECTION_WORKERS)
+    crop_mode: str = "static" # 'static' (one crop per clip) or 'dynamic' (crop follows the speaker)
 
-def update_status(project_id: str, status: str, message: str = ""):
-    project_status[project_id] = {"status": status, "message": message}
+def update_status(project_id: str, status: str, message: str = "", **details):
+    # Keep extra details (e.g. source codec) across status updates
+    entry = project_status.get(project_id, {})
+    entry.update({"status": status, "message": message}, **details)
+    project_status[project_id] = entry
     print(f"[{project_id}] Status: {status} - {message}")
 
+def process_clip(request: ProcessRequest, project_id: str, clip_num: int, total_clips: int,
+                 source_path: str, start: float, end: float, cut_path: str = None) -> str:
+    """
+    Cut -> Reframe -> Transcript -> Burn for one segment.
+    start/end are seconds relative to source_path. Returns the output file name.
+    cut_path: already-extracted cut of this segment (see extract_highlights).
+    """
+    clip_id = f"{project_id}_clip{clip_num}"
+    
+    if cut_path and os.path.exists(cut_path):
+        if request.fused_render:
+            return render_clip(request, project_id, clip_num, total_clips, cut_path)
+        return render_clip_legacy(request, project_id, clip_num, total_clips, cut_path)
+    
+    # Direct mode: every stage seeks into the source, no intermediate cut file
+    if request.fused_render and use_direct_seek(request.seek_mode, source_path):
+        try:
+            return render_clip(request, project_id, clip_num, total_clips, source_path, start, end)
+        except Exception as e:
+            print(f"[{project_id}] Direct seek render failed ({e}), falling back to cut file")
+    
+    update_status(project_id, "processing", f"Processing Clip {clip_num}/{total_clips}: Cutting...")
+    
+    # 2. Extract Highlight
+    cut_path = os.path.join(TEMP_DIR, f"{clip_id}_cut.mp4")
+    extract_highlight(source_path, start, end, cut_path)
+    
+    if request.fused_render:
+        return render_clip(request, project_id, clip_num, total_clips, cut_path)
+    return render_clip_legacy(request, project_id, clip_num, total_clips, cut_path)
+
+def render_clip_legacy(request: ProcessRequest, project_id: str, clip_num: int, total_clips: int, cut_path: str) -> str:
+    """Two-encode path: reframe, transcribe the reframed clip, then burn subtitles."""
+    clip_id = f"{project_id}_clip{clip_num}"
+    
+    update_status(project_id, "processing", f"Processing Clip {clip_num}/{total_clips}: Reframing (Face Detection)...")
+    
+    # 3. Auto Reframe (9:16) with Color Grading
+    reframed_path = os.path.join(OUTPUT_DIR, f"{clip_id}_9_16.mp4")
+    auto_reframe(cut_path, reframed_path, color_grading=request.color_grading, chunk_seconds=request.chunk_seconds,
+                 detection_mode=request.detection_mode, detection_workers=request.detection_workers,
+                 crop_mode=request.crop_mode)
+    
+    update_status(project_id, "processing", f"Processing Clip {clip_num}/{total_clips}: Generating subtitles...")
+    
+    # 4. Generate Subtitles (ASS - Karaoke)
+    ass_path = generate_dynamic_subtitles(reframed_path)
+    
+    update_status(project_id, "processing", f"Processing Clip {clip_num}/{total_clips}: Burning subtitles...")
+    
+    # 5. Burn Subtitles (Hardcode)
+    final_output_path = os.path.join(OUTPUT_DIR, f"{clip_id}_final.mp4")
+    
+    # FFmpeg filter to burn subtitles with HIGH QUALITY settings
+    ass_path_fwd = ass_path.replace("\\", "/")
+    
+    input_stream = ffmpeg.input(reframed_path)
+    video = input_stream.video.filter('ass', ass_path_fwd)
+    audio = input_stream.audio
+    
+    # Use same high-quality settings as reframing for consistency
+    # NOTE: When using CRF, do NOT specify video_bitrate (let CRF control it)
+    (
+        ffmpeg
+        .output(
+            video, audio, final_output_path,
+            vcodec='libx264',
+            acodec='aac',
+            **{
+                'crf': 18,                     # High quality (18 = visually lossless)
+                'preset': 'slow',              # Better compression
+                'profile:v': 'high',           # H.264 High Profile
+                'pix_fmt': 'yuv420p',          # Compatibility
+                'movflags': '+faststart',      # Web optimization
+                'b:a': '192k'                  # High quality audio (use b:a not audio_bitrate)
+            }
+        )
+        .overwrite_output()
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+    print(f"[{project_id}] Clip {clip_num} finished: {final_output_path}")
+    return f"{clip_id}_final.mp4"
+
+def use_direct_seek(seek_mode: str, source_path: str) -> bool:
+    if seek_mode == "direct":
+        return True
+    if seek_mode == "auto":
+        return source_seeks_well(source_path)
+    return False
+
+def render_clip(request: ProcessRequest, project_id: str, clip_num: int, total_clips: int,
+                clip_source: str, start: float = None, end: float = None) -> str:
+    """
+    Fused render of one clip: transcribe, then reframe + grade + burn in ONE encode.
+    clip_source is either a cut file (start/end None) or the full source with
+    the clip window given as start/end seconds.
+    """
+    clip_id = f"{project_id}_clip{clip_num}"
+    
+    # Subtitles from the clip's audio (reframing doesn't change timing)
+    update_status(project_id, "processing", f"Processing Clip {clip_num}/{total_clips}: Generating subtitles...")
+    ass_path = generate_dynamic_subtitles(
+        clip_source, start=start, end=end,
+        ass_path=os.path.join(TEMP_DIR, f"{clip_id}.ass")
+    )
+    
+    # Reframe + grade + burn subtitles in ONE encode
+    update_status(project_id, "processing", f"Processing Clip {clip_num}/{total_clips}: Rendering (Face Detection)...")
+    final_output_path = os.path.join(OUTPUT_DIR, f"{clip_id}_final.mp4")
+    auto_reframe(
+        clip_source, final_output_path,
+        color_grading=request.color_grading, subtitles_path=ass_path,
+        start=start, end=end, chunk_seconds=request.chunk_seconds,
+        detection_mode=request.detection_mode, detection_workers=request.detection_workers,
+        crop_mode=request.crop_mode
+    )
+    print(f"[{project_id}] Clip {clip_num} finished: {final_output_path}")
+    return f"{clip_id}_final.mp4"
+
 def process_pipeline(request: ProcessRequest, project_id: str):
     """
     Full processing pipeline: Download -> Cut -> Reframe -> Transcript -> Burn
     Processed sequentially for each segment.
     """
+    if request.streaming:
+        return process_pipeline_streaming(request, project_id)
+
+    sources = []
     try:
-        update_status(project_id, "processing", "Starting download...")
         print(f"[{project_id}] Starting processing for {request.youtube_url} @ {request.resolution}")
         
-        # 1. Download (Once)
-        video_path = download_youtube_video(
-            request.youtube_url, 
-            TEMP_DIR, 
-            request.resolution,
-            request.cookies_file
-        )
+        # 1. Download (Once) - skipped entirely when the source is already cached
+        video_path = lookup_cached_source(request.youtube_url, TEMP_DIR, request.resolution, request.format_policy)
+        if video_path:
+            update_status(project_id, "processing", "Using cached source video...")
+            sources = [{'path': video_path, 'offset': 0.0} for _ in request.segments]
+        elif request.range_download:
+            # Fetch only the requested time ranges (falls back to a full download)
+            update_status(project_id, "processing", "Downloading segment ranges...")
+            sources = download_youtube_video(
+                request.youtube_url,
+                TEMP_DIR,
+                request.resolution,
+                request.cookies_file,
+                segments=request.segments,
+                format_policy=request.format_policy
+            )
+        else:
+            update_status(project_id, "processing", "Starting download...")
+            video_path = download_youtube_video(
+                request.youtube_url, 
+                TEMP_DIR, 
+                request.resolution,
+                request.cookies_file,
+                format_policy=request.format_policy
+            )
+            sources = [{'path': video_path, 'offset': 0.0} for _ in request.segments]
+        
+        record_source_info(project_id, sources[0]['path'] if sources else None)
         
         output_files = []
         total_clips = len(request.segments)
         
+        # Times are relative to the downloaded file
+        windows = []
         for i, segment in enumerate(request.segments):
-            clip_num = i + 1
-            clip_id = f"{project_id}_clip{clip_num}"
-            
-            update_status(project_id, "processing", f"Processing Clip {clip_num}/{total_clips}: Cutting...")
-            
-            # 2. Extract Highlight
-            cut_path = os.path.join(TEMP_DIR, f"{clip_id}_cut.mp4")
-            extract_highlight(video_path, segment.start_time, segment.end_time, cut_path)
-            
-            update_status(project_id, "processing", f"Processing Clip {clip_num}/{total_clips}: Reframing (Face Detection)...")
-            
-            # 3. Auto Reframe (9:16) with Color Grading
-            reframed_path = os.path.join(OUTPUT_DIR, f"{clip_id}_9_16.mp4")
-            auto_reframe(cut_path, reframed_path, color_grading=request.color_grading)
-            
-            update_status(project_id, "processing", f"Processing Clip {clip_num}/{total_clips}: Generating subtitles...")
-            
-            # 4. Generate Subtitles (ASS - Karaoke)
-            ass_path = generate_dynamic_subtitles(reframed_path)
-            
-            update_status(project_id, "processing", f"Processing Clip {clip_num}/{total_clips}: Burning subtitles...")
-            
-            # 5. Burn Subtitles (Hardcode)
-            final_output_path = os.path.join(OUTPUT_DIR, f"{clip_id}_final.mp4")
-            
-            # FFmpeg filter to burn subtitles with HIGH QUALITY settings
-            ass_path_fwd = ass_path.replace("\\", "/")
-            
-            input_stream = ffmpeg.input(reframed_path)
-            video = input_stream.video.filter('ass', ass_path_fwd)
-            audio = input_stream.audio
-            
-            # Use same high-quality settings as reframing for consistency
-            # NOTE: When using CRF, do NOT specify video_bitrate (let CRF control it)
-            (
-                ffmpeg
-                .output(
-                    video, audio, final_output_path,
-                    vcodec='libx264',
-                    acodec='aac',
-                    **{
-                        'crf': 18,                     # High quality (18 = visually lossless)
-                        'preset': 'slow',              # Better compression
-                        'profile:v': 'high',           # H.264 High Profile
-                        'pix_fmt': 'yuv420p',          # Compatibility
-                        'movflags': '+faststart',      # Web optimization
-                        'b:a': '192k'                  # High quality audio (use b:a not audio_bitrate)
-                    }
-                )
-                .overwrite_output()
-                .run(capture_stdout=True, capture_stderr=True)
-            )
-            print(f"[{project_id}] Clip {clip_num} finished: {final_output_path}")
-            output_files.append(f"{clip_id}_final.mp4")
+            start, end = segment_bounds(segment)
+            windows.append((sources[i]['path'], start - sources[i]['offset'], end - sources[i]['offset']))
+        
+        # 2. Cut every segment that needs an intermediate file, one FFmpeg pass per source
+        cut_paths = [None] * total_clips
+        by_source = {}
+        for i, (path, start, end) in enumerate(windows):
+            if not (request.fused_render and use_direct_seek(request.seek_mode, path)):
+                by_source.setdefault(path, []).append(i)
+        for path, indices in by_source.items():
+            update_status(project_id, "processing", f"Cutting {len(indices)} segment(s)...")
+            batch_paths = [os.path.join(TEMP_DIR, f"{project_id}_clip{i + 1}_cut.mp4") for i in indices]
+            extract_highlights(path, [windows[i][1:] for i in indices], batch_paths)
+            for i, cut_path in zip(indices, batch_paths):
+                cut_paths[i] = cut_path
+        
+        for i, (path, start, end) in enumerate(windows):
+            output_files.append(process_clip(
+                request, project_id, i + 1, total_clips,
+                path, start, end, cut_path=cut_paths[i]
+            ))
         
         # Update status with list of Result Files
-        project_status[project_id] = {
-            "status": "completed", 
-            "message": "All clips processed",
-            "outputs": output_files
-        }
+        update_status(project_id, "completed", "All clips processed", outputs=output_files)
         
     except Exception as e:
         print(f"[{project_id}] Error: {str(e)}")
         update_status(project_id, "error", str(e))
         # In a real app, update DB status to 'error'
+    finally:
+        # Unpin the source so the cache may evict it later
+        for path in {source['path'] for source in sources}:
+            release_cached_source(path)
+
+def process_pipeline_streaming(request: ProcessRequest, project_id: str):
+    """
+    Streaming variant: the download runs in the background (range mode, so
+    sections land one by one in time order) and each clip starts as soon as
+    the data covering it is on disk. Time-to-first-clip then depends on where
+    the earliest segment is, not on the total video length.
+    """
+    progress = DownloadProgress()
+    download_result = {}
+    
+    def run_download():
+        try:
+            download_result['sources'] = download_youtube_video(
+                request.youtube_url,
+                TEMP_DIR,
+                request.resolution,
+                request.cookies_file,
+                segments=request.segments,
+                format_policy=request.format_policy,
+                progress=progress
+            )
+        except Exception as e:
+            # progress.fail() already carries the error to the waiting clips
+            print(f"[{project_id}] Download error: {e}")
+    
+    download_thread = threading.Thread(target=run_download, daemon=True)
+    try:
+        print(f"[{project_id}] Starting streaming processing for {request.youtube_url} @ {request.resolution}")
+        update_status(project_id, "processing", "Starting download...")
+        download_thread.start()
+        
+        total_clips = len(request.segments)
+        bounds = [segment_bounds(segment) for segment in request.segments]
+        output_files = [None] * total_clips
+        
+        # Sections arrive in time order, so process clips in that order too
+        for i in sorted(range(total_clips), key=lambda i: bounds[i][0]):
+            start, end = bounds[i]
+            located = None
+            while located is None:
+                located = progress.wait_for_range(start, end, timeout=2.0)
+                if located is None:
+                    update_status(project_id, "processing", f"Clip {i + 1}/{total_clips}: waiting for download ({progress.percent:.0f}%)...")
+            path, offset = located
+            if all(output is None for output in output_files):
+                record_source_info(project_id, path)
+            
+            output_files[i] = process_clip(
+                request, project_id, i + 1, total_clips,
+                path, start - offset, end - offset
+            )
+        
+        update_status(project_id, "completed", "All clips processed", outputs=output_files)
+        
+    except Exception as e:
+        print(f"[{project_id}] Error: {str(e)}")
+        update_status(project_id, "error", str(e))
+    finally:
+        # Wait for the download so its cache pin can be released
+        if download_thread.is_alive():
+            download_thread.join()
+        for path in {source['path'] for source in download_result.get('sources', [])}:
+            release_cached_source(path)
+
+def record_source_info(project_id: str, path: Optional[str]):
+    """Adds the downloaded format/codec to the job status."""
+    source_info = describe_source(path, TEMP_DIR) if path else {}
+    if source_info:
+        update_status(project_id, "processing", f"Source ready ({source_info.get('vcodec')}, {source_info.get('height')}p)", source=source_info)
 
 @app.get("/api/status/{project_id}")
 def get_status(project_id: str):
     return project_status.get(project_id, {"status": "not_found", "message": "Project not found"})
 
+@app.get("/api/cache")
+def get_cache_stats():
+    return {**get_source_cache_stats(TEMP_DIR), "detection_cache": dict(detection_cache_stats)}
+
+@app.get("/api/luts")
+def list_luts():
+    return {
+        "backend": GRADING_BACKEND,
+        "presets": list(COLOR_GRADING_PRESETS),
+        "custom": luts.load_custom_luts(),
+    }
+
+@app.post("/api/luts")
+async def upload_lut(name: str = Form(...), file: UploadFile = File(...)):
+    # Registered LUTs are usable as ProcessRequest.color_grading
+    if name in COLOR_GRADING_PRESETS:
+        raise HTTPException(status_code=400, detail=f"'{name}' is a built-in preset")
+    try:
+        cube_text = (await file.read()).decode("utf-8")
+        entry = luts.register_custom_lut(name, cube_text)
+    except (UnicodeDecodeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid .cube file: {e}")
+    return {"name": name, **entry}
+
 @app.post("/api/process")
 async def process_video(request: ProcessRequest, background_tasks: BackgroundTasks):
     project_id = str(uuid.uuid4())
@@ -0,0 +1,83 @@
+"""
+Test that extract_highlights (one FFmpeg process for all segments) cuts
+exactly what extract_highlight cuts segment by segment.
+
+Generates a synthetic 30 fps source with a 2 s GOP, cuts segments that start
+mid-GOP both ways and compares frame count, first video/audio timestamp and
+per-frame hashes of the decoded video (FFmpeg's framemd5 muxer).
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import ffmpeg
+from core.processing import extract_highlight, extract_highlights
+
+TEST_DIR = "temp/batch_cut"
+SOURCE_DURATION = 40  # seconds
+SEGMENTS = [(11.0, 15.0), (21.0, 25.0)]
+
+
+def make_source_video(path: str):
+    (
+        ffmpeg
+        .output(
+            ffmpeg.input(f"testsrc2=size=640x360:rate=30:duration={SOURCE_DURATION}", f="lavfi").video,
+            ffmpeg.input(f"sine=frequency=440:duration={SOURCE_DURATION}", f="lavfi").audio,
+            path, vcodec="libx264", acodec="aac", g=60
+        )
+        .overwrite_output()
+        .run(quiet=True)
+    )
+
+
+def frame_hashes(path: str, stream: str) -> list:
+    """(pts seconds, md5) of every decoded frame of the first `stream` ('v' or 'a')."""
+    out, _ = (
+        ffmpeg
+        .input(path)
+        .output('pipe:', format='framemd5', map=f'0:{stream}:0')
+        .run(capture_stdout=True, capture_stderr=True)
+    )
+    timebase = 1.0
+    frames = []
+    for line in out.decode().splitlines():
+        if line.startswith('#tb'):
+            num, den = line.split(':')[1].strip().split('/')
+            timebase = int(num) / int(den)
+        elif line and not line.startswith('#'):
+            fields = [field.strip() for field in line.split(',')]
+            frames.append((int(fields[1]) * timebase, fields[5]))
+    return frames
+
+
+if __name__ == "__main__":
+    os.makedirs(TEST_DIR, exist_ok=True)
+    source_path = os.path.join(TEST_DIR, "source.mp4")
+    if not os.path.exists(source_path):
+        print("🎞️  Generating synthetic source video...")
+        make_source_video(source_path)
+
+    single_paths = [os.path.join(TEST_DIR, f"single_{i}.mp4") for i in range(len(SEGMENTS))]
+    batch_paths = [os.path.join(TEST_DIR, f"batch_{i}.mp4") for i in range(len(SEGMENTS))]
+    for (start, end), path in zip(SEGMENTS, single_paths):
+        extract_highlight(source_path, start, end, path)
+    extract_highlights(source_path, SEGMENTS, batch_paths)
+
+    print("=" * 60)
+    ok = True
+    for (start, end), single_path, batch_path in zip(SEGMENTS, single_paths, batch_paths):
+        single, batch = frame_hashes(single_path, 'v'), frame_hashes(batch_path, 'v')
+        single_audio, batch_audio = frame_hashes(single_path, 'a'), frame_hashes(batch_path, 'a')
+        same = (
+            len(single) == len(batch)
+            and abs(single[0][0] - batch[0][0]) < 1e-3
+            and abs(single_audio[0][0] - batch_audio[0][0]) < 1e-3
+            and [md5 for _, md5 in single] == [md5 for _, md5 in batch]
+        )
+        ok = ok and same
+        print(f"{'✅' if same else '❌'} {start:.0f}-{end:.0f}s  "
+              f"extract_highlight: {len(single)} frames from {single[0][0]:.3f}s  "
+              f"extract_highlights: {len(batch)} frames from {batch[0][0]:.3f}s")
+    print("=" * 60)
+    sys.exit(0 if ok else 1)
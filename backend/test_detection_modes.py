@@ -0,0 +1,133 @@
+"""
+Test the 'tracked', 'converge' and 'roi' detection modes on synthetic clips.
+
+No models needed: the face detector is replaced by a stand-in that "finds"
+the bright checkerboard patch drawn into the clip, so each case knows
+exactly when and where the face is.
+
+Cases:
+- tracked, no face at all        -> no detection, no crash
+- tracked, face appears late     -> tracking starts from the first detection
+- tracked vs dense               -> tracked never calls the detector more often
+- converge, static face          -> stops before reading every sample
+- roi, cached                    -> a full cache hit still reports roi_stats
+"""
+import sys
+import os
+import shutil
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import cv2
+import numpy as np
+from core import detection_cache, processing
+from core.processing import detect_subjects, detect_subjects_cached, DetectorPool
+
+CLIP_DIR = "temp/detection_modes"
+WIDTH, HEIGHT, FPS = 640, 360, 30
+FACE_SIZE = 64
+FACE_X, FACE_Y = 400, 80
+
+detector_calls = 0
+
+
+def make_clip(path: str, frames: int, face_from: int = None):
+    """Static noise background; checkerboard 'face' from frame face_from on."""
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 150, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+    cells = (np.indices((FACE_SIZE, FACE_SIZE)) // 8).sum(axis=0) % 2
+    face = np.where(cells[..., None] == 1, 255, 60).astype(np.uint8).repeat(3, axis=2)
+
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), FPS, (WIDTH, HEIGHT))
+    for frame_num in range(frames):
+        frame = background.copy()
+        if face_from is not None and frame_num >= face_from:
+            frame[FACE_Y:FACE_Y + FACE_SIZE, FACE_X:FACE_X + FACE_SIZE] = face
+        writer.write(frame)
+    writer.release()
+
+
+def fake_best_face(detector, frame_rgb, source, width, height, offset=(0, 0)):
+    """Stand-in for _best_face: the bright pixels of the frame are the face."""
+    global detector_calls
+    detector_calls += 1
+    ys, xs = np.nonzero(frame_rgb.min(axis=2) > 220)
+    if len(xs) < 50:
+        return None
+    x, y = xs.min() + offset[0], ys.min() + offset[1]
+    w, h = xs.max() - xs.min() + 1, ys.max() - ys.min() + 1
+    return (x + w / 2) * source.scale_x, w * source.scale_x, 0.9, (x * source.scale_x, y * source.scale_y, w, h)
+
+
+def detect_counting(path: str, mode: str) -> tuple:
+    """detect_subjects (faces only) plus the number of face detector calls it made."""
+    global detector_calls
+    detector_calls = 0
+    result = detect_subjects(path, WIDTH, HEIGHT, detectors=('face',), mode=mode)
+    return result, detector_calls
+
+
+def check(name: str, ok: bool, detail: str = ""):
+    print(f"{'✅' if ok else '❌'} {name}{'  ' + detail if detail else ''}")
+    return ok
+
+
+if __name__ == "__main__":
+    os.makedirs(CLIP_DIR, exist_ok=True)
+    processing._best_face = fake_best_face
+    processing.detector_registry.face = DetectorPool('face', object, 1)
+
+    no_face = os.path.join(CLIP_DIR, "no_face.mp4")
+    late_face = os.path.join(CLIP_DIR, "late_face.mp4")
+    static_face = os.path.join(CLIP_DIR, "static_face.mp4")
+    make_clip(no_face, 90)
+    # Face appears between detector grid samples (30 and 45)
+    make_clip(late_face, 150, face_from=37)
+    make_clip(static_face, 900, face_from=0)
+
+    print("=" * 60)
+    results = []
+
+    result, no_face_calls = detect_counting(no_face, 'tracked')
+    results.append(check("tracked, no face", result is None))
+
+    result, late_face_calls = detect_counting(late_face, 'tracked')
+    frames = [f for f, _, _, _ in result['positions']] if result else []
+    expected_x = FACE_X + FACE_SIZE / 2
+    # Found on the next detector grid sample, then tracked every TRACK_FRAME_INTERVAL
+    results.append(check(
+        "tracked, late face",
+        bool(frames) and frames[0] == 45 and len(frames) == len(range(45, 150, processing.TRACK_FRAME_INTERVAL))
+        and all(abs(x - expected_x) < 4 for _, x, _, _ in result['positions']),
+        f"first face frame {frames[0] if frames else None}, {len(frames)} positions",
+    ))
+
+    for name, path, tracked_calls in (("no face", no_face, no_face_calls), ("late face", late_face, late_face_calls)):
+        _, dense_calls = detect_counting(path, 'dense')
+        results.append(check(
+            f"tracked vs dense, {name}", tracked_calls <= dense_calls,
+            f"{tracked_calls} tracked vs {dense_calls} dense detector calls",
+        ))
+
+    result = detect_subjects(static_face, WIDTH, HEIGHT, detectors=('face',), mode='converge')
+    convergence = (result or {}).get('convergence') or {}
+    results.append(check(
+        "converge, static face",
+        convergence.get('converged', False) and convergence['samples_used'] < convergence['samples_total'],
+        f"{convergence.get('samples_used')}/{convergence.get('samples_total')} samples",
+    ))
+
+    detection_cache.DETECTION_CACHE_DIR = os.path.join(CLIP_DIR, "detection_cache")
+    shutil.rmtree(detection_cache.DETECTION_CACHE_DIR, ignore_errors=True)
+    runs = [
+        detect_subjects_cached(late_face, WIDTH, HEIGHT, FPS, 150, 0.0, 150 / FPS, mode='roi', workers=1)
+        for _ in range(2)
+    ]
+    stats = [(run or {}).get('roi_stats') for run in runs]
+    results.append(check(
+        "roi, cached",
+        detection_cache.detection_cache_stats['hits'] == 1 and stats[0] is not None and stats[0] == stats[1],
+        f"roi_stats on hit: {stats[1]}",
+    ))
+
+    print("=" * 60)
+    sys.exit(0 if all(results) else 1)
@@ -0,0 +1,123 @@
+"""
+Test range downloads against a local stand-in server (no YouTube needed).
+
+Generates a synthetic video with FFmpeg, serves it over HTTP with byte-range
+support, then downloads two short segments through download_youtube_video
+and reports how many bytes were actually transferred.
+"""
+import sys
+import os
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from functools import partial
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.downloader import download_youtube_video
+import ffmpeg
+
+SERVE_DIR = "temp/range_server"
+SOURCE_NAME = "range_source.mp4"
+SOURCE_DURATION = 120  # seconds
+SEGMENTS = [("00:00:20", "00:00:25"), ("00:01:30", "00:01:34")]
+
+bytes_served = 0
+
+
+class RangeRequestHandler(SimpleHTTPRequestHandler):
+    """SimpleHTTPRequestHandler plus 'Range: bytes=a-b' support (FFmpeg seeks with it)."""
+
+    def send_head(self):
+        global bytes_served
+        range_header = self.headers.get("Range")
+        path = self.translate_path(self.path)
+        if not range_header or not os.path.isfile(path):
+            if os.path.isfile(path):
+                bytes_served += os.path.getsize(path)
+            return super().send_head()
+
+        size = os.path.getsize(path)
+        start_str, _, end_str = range_header.replace("bytes=", "").partition("-")
+        start = int(start_str) if start_str else 0
+        end = min(int(end_str), size - 1) if end_str else size - 1
+
+        f = open(path, "rb")
+        f.seek(start)
+        self.send_response(206)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        bytes_served += end - start + 1
+        self.range_remaining = end - start + 1
+        return f
+
+    def copyfile(self, source, outputfile):
+        remaining = getattr(self, "range_remaining", None)
+        if remaining is None:
+            return super().copyfile(source, outputfile)
+        while remaining > 0:
+            chunk = source.read(min(64 * 1024, remaining))
+            if not chunk:
+                break
+            try:
+                outputfile.write(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                break  # FFmpeg closes the connection once it has what it needs
+            remaining -= len(chunk)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_source_video(path: str):
+    (
+        ffmpeg
+        .output(
+            ffmpeg.input(f"testsrc2=size=1280x720:rate=30:duration={SOURCE_DURATION}", f="lavfi").video,
+            ffmpeg.input(f"sine=frequency=440:duration={SOURCE_DURATION}", f="lavfi").audio,
+            path, vcodec="libx264", acodec="aac", g=60, movflags="+faststart"
+        )
+        .overwrite_output()
+        .run(quiet=True)
+    )
+
+
+if __name__ == "__main__":
+    os.makedirs(SERVE_DIR, exist_ok=True)
+    source_path = os.path.join(SERVE_DIR, SOURCE_NAME)
+    if not os.path.exists(source_path):
+        print("🎞️  Generating synthetic source video...")
+        make_source_video(source_path)
+
+    handler = partial(RangeRequestHandler, directory=SERVE_DIR)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/{SOURCE_NAME}"
+
+    print("=" * 60)
+    print(f"Stand-in server: {url}")
+    print(f"Segments: {SEGMENTS}")
+    print("=" * 60)
+
+    try:
+        sources = download_youtube_video(url, output_dir="temp", resolution="720p", segments=SEGMENTS)
+    finally:
+        server.shutdown()
+
+    source_size = os.path.getsize(source_path)
+    for (start, end), source in zip(SEGMENTS, sources):
+        duration = float(ffmpeg.probe(source["path"])["format"]["duration"])
+        print(f"\n{start} - {end}")
+        print(f"  File:     {source['path']}")
+        print(f"  Offset:   {source['offset']:.1f}s")
+        print(f"  Duration: {duration:.1f}s")
+
+    print("\n" + "=" * 60)
+    print(f"Source size:  {source_size / (1024*1024):.2f} MB")
+    print(f"Bytes served: {bytes_served / (1024*1024):.2f} MB ({bytes_served / source_size * 100:.0f}%)")
+    if all(source["offset"] == 0.0 for source in sources):
+        print("⚠️  Range download fell back to a full download")
+    else:
+        print("✅ Only the requested ranges were fetched")
+    print("=" * 60)